@@ -1,16 +1,52 @@
+import importlib.util
+import os
+
 import dash
 from dash import html, dcc
 import dash_bootstrap_components as dbc
 from dash.dependencies import Input, Output
 
+import ingest
+import kpis
+import metrics
+import rollups
+import scheduler
+import theme  # noqa: F401  (registers the default Plotly template)
+
 # Initialize the app with a bootstrap theme
 app = dash.Dash(
     __name__, 
     use_pages=True, 
     external_stylesheets=[dbc.themes.BOOTSTRAP],
-    suppress_callback_exceptions=True
+    suppress_callback_exceptions=True,
+    # gzip responses when flask-compress is installed (pip install dash[compress])
+    compress=importlib.util.find_spec("flask_compress") is not None,
 )
 
+# WSGI entry point for multi-worker servers (gunicorn app:server)
+server = app.server
+
+# Opt-in /metrics and /profile endpoints (DASHBOARD_METRICS=1)
+metrics.instrument_pages(dash.page_registry)
+metrics.register(server)
+
+# Opt-in POST /ingest/<table> for POS batches (DASHBOARD_INGEST=1)
+ingest.register(server)
+
+
+def start_background_work():
+    """Start the threads and worker processes of a serving process.
+
+    Importing the app starts nothing, so the store pool's workers can import
+    it too. Under gunicorn, call this from a post_fork hook.
+    """
+    # Aggregate large reads store by store in parallel (DASHBOARD_STORE_WORKERS)
+    rollups.start_pool()
+    # Keep the Overview KPI snapshot fresh off the request path (DASHBOARD_KPI_REFRESH=<seconds>)
+    kpis.start_background_refresh()
+    # Precompute aggregates off the request path
+    scheduler.start()
+
 # Custom CSS for the Yellow, White, and Black theme
 # Yellow: #FFD700 (Gold/Yellow)
 # Black: #000000
@@ -53,15 +89,64 @@ sidebar = html.Div(
             vertical=True,
             pills=True,
         ),
+        html.Hr(style={"border-top": "1px solid #FFD700"}),
+        html.H6("DATE RANGE", style={"font-weight": "bold", "color": "#FFD700"}),
+        dcc.DatePickerRange(
+            id="date-range-picker",
+            clearable=True,
+            display_format="YYYY-MM-DD",
+            persistence=True,
+            persistence_type="session",
+        ),
+        html.H6("STORE", style={"font-weight": "bold", "color": "#FFD700", "margin-top": "1rem"}),
+        dcc.Dropdown(
+            id="store-picker",
+            placeholder="All stores",
+            clearable=True,
+            persistence=True,
+            persistence_type="session",
+            style={"color": "#000000"},
+        ),
     ],
     style=sidebar_style,
 )
 
 app.layout = html.Div([
     dcc.Location(id="url"),
+    # Global date filter read by every page callback
+    dcc.Store(id="date-range", storage_type="session"),
+    # Selected store id, or None for the whole chain
+    dcc.Store(id="store", storage_type="session"),
     sidebar,
     html.Div(dash.page_container, style=content_style)
 ])
 
+@app.callback(
+    Output("date-range", "data"),
+    Input("date-range-picker", "start_date"),
+    Input("date-range-picker", "end_date"),
+)
+def store_date_range(start_date, end_date):
+    return {"start": start_date, "end": end_date}
+
+@app.callback(
+    Output("store", "data"),
+    Input("store-picker", "value"),
+)
+def store_selected_store(store_id):
+    return store_id
+
+@app.callback(
+    Output("store-picker", "options"),
+    Input("url", "pathname"),
+)
+def update_store_options(_):
+    return [{"label": f"Store {store_id}", "value": store_id} for store_id in rollups.store_ids()]
+
 if __name__ == "__main__":
-    app.run(debug=True, port=8050)
+    debug = True
+    # With the debug reloader only the child process that serves requests
+    # runs the background work
+    if not debug or os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_background_work()
+    app.run(debug=debug, port=8050)
@@ -0,0 +1,227 @@
+"""Benchmark every page callback and layout at increasing data sizes.
+
+    python benchmark.py --sizes 10k,1M,50M --output results.json
+    python benchmark.py --sizes 10k,1M --baseline results.json
+
+Each size gets a generated dataset (kept under --data-root and reused on
+later runs once it is complete). Every page callback and page layout is
+then run in its own process pointed at that dataset, so the reported peak
+RSS belongs to that target alone. Cold timings clear the data, rollup,
+KPI and shared caches before each call; warm timings repeat the call
+against the filled caches. Figure caching is disabled so each callback does its full work.
+
+With --baseline, results are compared with an earlier run and any target
+whose p95 latency, peak RSS or serialized size grew by more than
+--threshold is reported as a regression (exit status 1).
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+current_dir = os.path.dirname(os.path.abspath(__file__))
+
+SUFFIXES = {'k': 1_000, 'M': 1_000_000, 'B': 1_000_000_000}
+
+# Days of history in every benchmark dataset
+DAYS = 365
+
+# File written into a dataset directory once generation has finished
+COMPLETE_MARKER = '.complete'
+
+# Metrics compared against the baseline
+COMPARED = [('cold', 'p95_ms'), ('warm', 'p95_ms'), ('peak_rss_mb',), ('bytes',)]
+
+# Smallest absolute growth worth flagging, so timer noise on sub-millisecond targets is ignored
+MIN_GROWTH = {'p95_ms': 5, 'peak_rss_mb': 10, 'bytes': 0}
+
+
+def parse_size(text):
+    """Parse an order-line count such as 10k, 1M or 50M."""
+    if text[-1] in SUFFIXES:
+        return int(float(text[:-1]) * SUFFIXES[text[-1]])
+    return int(text)
+
+
+def dataset_dir(data_root, size, fmt):
+    return os.path.join(data_root, f'{size}-{fmt}')
+
+
+def ensure_dataset(data_root, size, fmt):
+    """Generate the dataset for a size unless an earlier run completed it."""
+    directory = dataset_dir(data_root, size, fmt)
+    marker = os.path.join(directory, COMPLETE_MARKER)
+    if os.path.exists(marker):
+        return directory
+    # Whatever an interrupted run left behind is regenerated from scratch
+    shutil.rmtree(directory, ignore_errors=True)
+    rows = parse_size(size)
+    print(f"Generating {size} order lines in {directory}", file=sys.stderr)
+    subprocess.run([
+        sys.executable, os.path.join(current_dir, 'data', 'generate_data.py'),
+        '--days', str(DAYS),
+        '--orders-per-day', str(max(rows // DAYS, 1)),
+        '--format', fmt,
+        '--output-dir', directory,
+    ], check=True)
+    # Written last, so a dataset is only reused once every table is in place
+    with open(marker, 'w'):
+        pass
+    return directory
+
+
+def _stats(samples):
+    samples = np.array(samples) * 1000
+    return {
+        'p50_ms': round(float(np.percentile(samples, 50)), 3),
+        'p95_ms': round(float(np.percentile(samples, 95)), 3),
+        'max_ms': round(float(samples.max()), 3),
+    }
+
+
+def list_targets():
+    """Return the names of every page callback and page layout."""
+    import app  # noqa: F401  (registers the pages and their callbacks)
+    import dash
+    import routing
+    targets = [f'callback:{page_id}' for page_id in sorted(routing.page_callbacks)]
+    targets += [f'layout:{page["module"].split(".")[-1]}' for page in dash.page_registry.values()]
+    return targets
+
+
+def run_target(target, repeat, date_range):
+    """Time one target in this process and return its measurements."""
+    import resource
+
+    import dash
+    import plotly.io as pio
+
+    import app  # noqa: F401
+    import cache_backends
+    import data_store
+    import kpis
+    import rollups
+    import routing
+
+    kind, page_id = target.split(':')
+    if kind == 'callback':
+        func = routing.page_callbacks[page_id]
+        call = lambda: list(func(None, date_range, None))
+    else:
+        page = next(page for page in dash.page_registry.values()
+                    if page['module'].split('.')[-1] == page_id)
+        call = page['layout']
+
+    def timed(clear):
+        samples = []
+        for _ in range(repeat):
+            if clear:
+                rollups.clear()
+                data_store.clear()
+                kpis.clear()
+                cache_backends.get_backend().clear()
+            started = time.perf_counter()
+            result = call()
+            samples.append(time.perf_counter() - started)
+        return samples, result
+
+    cold, _ = timed(clear=True)
+    warm, result = timed(clear=False)
+    return {
+        'cold': _stats(cold),
+        'warm': _stats(warm),
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        'bytes': len(pio.json.to_json_plotly(result)),
+    }
+
+
+def run_in_process(directory, fmt, target, repeat, date_range):
+    """Run one target in a fresh interpreter pointed at a dataset."""
+    env = dict(os.environ, DASHBOARD_DATA_DIR=directory, DASHBOARD_STORAGE=fmt,
+               DASHBOARD_CACHE='memory', DASHBOARD_CACHE_BYTES='0')
+    command = [sys.executable, __file__, '--worker', target, '--repeat', str(repeat)]
+    if date_range:
+        command += ['--date-range', json.dumps(date_range)]
+    output = subprocess.run(command, env=env, cwd=current_dir, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+def compare(results, baseline, threshold):
+    """List the measurements that grew by more than threshold over the baseline."""
+    regressions = []
+    for size, targets in results['sizes'].items():
+        for target, current in targets.items():
+            previous = baseline.get('sizes', {}).get(size, {}).get(target)
+            if previous is None:
+                continue
+            for path in COMPARED:
+                old, new = previous, current
+                for part in path:
+                    old, new = old[part], new[part]
+                if old > 0 and (new - old) / old > threshold and new - old > MIN_GROWTH[path[-1]]:
+                    regressions.append(f"{size} {target} {'.'.join(path)}: {old} -> {new} "
+                                       f"(+{(new - old) / old:.0%})")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard page callbacks and layouts.")
+    parser.add_argument('--sizes', default='10k,1M,50M', help="Comma-separated order-line counts")
+    parser.add_argument('--format', choices=['csv', 'parquet', 'feather'], default='csv')
+    parser.add_argument('--repeat', type=int, default=5, help="Calls per target for each of cold and warm")
+    parser.add_argument('--targets', help="Comma-separated targets (default: all, see --list)")
+    parser.add_argument('--date-range', type=json.loads, help='e.g. \'{"start": "2024-01-01", "end": "2024-03-31"}\'')
+    parser.add_argument('--data-root', default=os.path.join(current_dir, 'data', 'benchmarks'))
+    parser.add_argument('--output', default='benchmark_results.json')
+    parser.add_argument('--baseline', help="Earlier results file to compare against")
+    parser.add_argument('--threshold', type=float, default=0.2, help="Relative growth flagged as a regression")
+    parser.add_argument('--list', action='store_true', help="List the benchmark targets and exit")
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_target(args.worker, args.repeat, args.date_range)))
+        return
+    if args.list:
+        print('\n'.join(list_targets()))
+        return
+
+    targets = args.targets.split(',') if args.targets else list_targets()
+    results = {
+        'format': args.format,
+        'repeat': args.repeat,
+        'date_range': args.date_range,
+        'sizes': {},
+    }
+    for size in args.sizes.split(','):
+        directory = ensure_dataset(args.data_root, size, args.format)
+        results['sizes'][size] = {}
+        for target in targets:
+            result = run_in_process(directory, args.format, target, args.repeat, args.date_range)
+            results['sizes'][size][target] = result
+            print(f"{size:>6} {target:<22} cold p50 {result['cold']['p50_ms']:>10.1f} ms  "
+                  f"p95 {result['cold']['p95_ms']:>10.1f} ms  warm p95 {result['warm']['p95_ms']:>8.1f} ms  "
+                  f"rss {result['peak_rss_mb']:>8.1f} MB  {result['bytes']:>10,} bytes")
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,191 @@
+"""Cache backends shared by the figure cache and the rollups.
+
+DASHBOARD_CACHE selects the backend:
+
+    memory                   per-process LRU (default)
+    filesystem:/some/dir     directory shared by every worker on the host
+    redis://localhost:6379/0 any Redis-protocol server (needs the redis package)
+
+Cache keys embed the data version, so workers agree on which entries are
+current without talking to each other. Entries of several versions live
+side by side (the refresh scheduler fills the next version's while requests
+still read the published one), and those of older data age out through
+the size cap, or the Redis server's maxmemory policy.
+"""
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+
+CACHE_URL = os.environ.get('DASHBOARD_CACHE', 'memory')
+
+# Size cap for the memory and filesystem backends; 0 disables caching
+MAX_BYTES = int(os.environ.get('DASHBOARD_CACHE_BYTES', 64 * 1024 * 1024))
+
+KEY_PREFIX = 'dashboard:'
+
+_backend = None
+_lock = threading.Lock()
+
+
+def _sizeof(value):
+    if isinstance(value, (bytes, str)):
+        return len(value)
+    return sys.getsizeof(value)
+
+
+class MemoryBackend:
+    """Least-recently-used cache private to this process."""
+
+    shared = False
+
+    def __init__(self, max_bytes=MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        size = _sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._size -= _sizeof(self._entries.pop(key))
+            self._entries[key] = value
+            self._size += size
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= _sizeof(evicted)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+class FileSystemBackend:
+    """Cache in a directory, shared by every worker process on the host.
+
+    Entries are written atomically, and the least recently written ones are
+    removed once the directory grows past max_bytes.
+    """
+
+    shared = True
+
+    def __init__(self, directory, max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha1(key.encode()).hexdigest() + '.pkl')
+
+    def get(self, key):
+        try:
+            with open(self._path(key), 'rb') as f:
+                return pickle.load(f)
+        except (FileNotFoundError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def set(self, key, value):
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) > self.max_bytes:
+            return
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, self._path(key))
+        self._evict()
+
+    def _evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pkl'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pkl'):
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+
+class RedisBackend:
+    """Cache in a Redis-protocol server shared by every worker.
+
+    Size limits are left to the server's maxmemory policy.
+    """
+
+    shared = True
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("The redis cache backend needs the 'redis' package") from None
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        data = self._client.get(KEY_PREFIX + key)
+        return None if data is None else pickle.loads(data)
+
+    def set(self, key, value):
+        self._client.set(KEY_PREFIX + key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+
+    def clear(self):
+        keys = list(self._client.scan_iter(match=KEY_PREFIX + '*'))
+        if keys:
+            self._client.delete(*keys)
+
+
+def create_backend(url):
+    """Create a backend from a DASHBOARD_CACHE style URL."""
+    if url == 'memory':
+        return MemoryBackend()
+    if url.startswith('filesystem:'):
+        return FileSystemBackend(url[len('filesystem:'):])
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisBackend(url)
+    raise ValueError(f"Unknown cache backend: {url}")
+
+
+def get_backend():
+    """Return the process-wide cache backend configured by DASHBOARD_CACHE."""
+    global _backend
+    if _backend is None:
+        with _lock:
+            if _backend is None:
+                _backend = create_backend(CACHE_URL)
+    return _backend
+
+
+def make_key(*parts):
+    """Build a compact cache key from arbitrary parts."""
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
@@ -0,0 +1,286 @@
+"""Declarative chart registry and the planner that serves it.
+
+Pages register each chart as the measures it shows, the dimensions it
+breaks them down by, optional filters and a visual type:
+
+    charts.register('category-pie-graph', measures=['total_price'],
+                    dimensions=['category'], visual='pie')
+
+render() plans every chart of a page view together. Every distinct
+(dimensions, filters) aggregate is computed once, with all the measures its
+charts need, then fanned out to the charts. The groupby behind it runs on
+the slice of its source table (the sales cube or the expense cube) for the
+date range and store, and is cached as a rollup until that table changes,
+so the pages sharing an aggregate share the groupby too. Adding a chart to
+a page therefore adds at most one groupby, never another read of the data.
+
+With DASHBOARD_QUERY_BACKEND set (see query_backend.py), the aggregates
+run as SQL queries against an embedded database instead.
+"""
+import pandas as pd
+
+import figures
+import metrics
+import query_backend
+import resolution
+import rollups
+import routing
+from utils import slice_dates
+
+# Measure -> source table it is summed from
+MEASURES = {
+    'quantity': 'sales',
+    'total_price': 'sales',
+    'lines': 'sales',
+    'amount': 'expenses',
+}
+
+# Measures computed from others once their aggregates are joined on the chart's dimensions
+DERIVED = {
+    'profit': (('total_price', 'amount'), lambda df: df['total_price'] - df['amount']),
+}
+
+
+def _menu_attribute(column):
+    def lookup(dish_ids):
+        return rollups.menu_dimension()[column].reindex(dish_ids).to_numpy()
+    return lookup
+
+
+# Dimension -> (key column of the source, function mapping keys to the dimension), used
+# when the source does not carry the dimension itself; keys mapping to nothing are dropped
+LOOKUPS = {
+    'dish_name': ('dish_id', _menu_attribute('dish_name')),
+    'category': ('dish_id', _menu_attribute('category')),
+    'price': ('dish_id', _menu_attribute('price')),
+    'day_of_week': ('date', lambda dates: pd.to_datetime(dates).dt.day_name().to_numpy()),
+}
+
+
+def _sales_source(start, end, store):
+    return rollups.sales_cube(start, end, store)
+
+
+def _expense_source(start, end, store):
+    return slice_dates(rollups.expense_cube(store=store), start, end)
+
+
+# Source table -> slice of its cube for a date range and store
+SOURCES = {
+    'sales': _sales_source,
+    'expenses': _expense_source,
+}
+
+
+def _grouped(source):
+    """Rollup summing a source's slice by its own columns, cached per key and measure tuple."""
+    def grouped(start, end, store, keys, measures):
+        return SOURCES[source](start, end, store).groupby(list(keys))[list(measures)].sum().reset_index()
+    grouped.__name__ = f'{source}_grouped'
+    return rollups.rollup(source)(grouped)
+
+
+# Source table -> cached aggregate of its slice
+GROUPED = {source: _grouped(source) for source in SOURCES}
+
+# Source table -> the dimensions it can be grouped by directly
+SOURCE_KEYS = {
+    'sales': rollups.SALES_KEYS,
+    'expenses': ['date', 'category'],
+}
+
+# Chart id -> spec
+registry = {}
+
+
+def register(chart_id, measures, dimensions, visual, filters=None, **options):
+    """Describe a chart: measures summed by dimensions, filters on dimension values, and how to draw it.
+
+    Options are passed to the visual, e.g. color, x_title, y_title, top (keep
+    the largest rows by the first measure) and layout (extra layout settings).
+    """
+    unknown = [m for m in measures if m not in MEASURES and m not in DERIVED]
+    if unknown or visual not in VISUALS:
+        raise ValueError(f"chart {chart_id!r}: unknown measures {unknown} or visual {visual!r}")
+    registry[chart_id] = {
+        'measures': list(measures),
+        'dimensions': list(dimensions),
+        'visual': visual,
+        'filters': dict(filters or {}),
+        'options': options,
+    }
+
+
+def _base_measures(spec):
+    """Group a chart's stored measures by source table."""
+    by_source = {}
+    for measure in spec['measures']:
+        for base in DERIVED[measure][0] if measure in DERIVED else (measure,):
+            by_source.setdefault(MEASURES[base], [])
+            if base not in by_source[MEASURES[base]]:
+                by_source[MEASURES[base]].append(base)
+    return by_source
+
+
+def _aggregate_key(spec):
+    return (tuple(spec['dimensions']), tuple(sorted((k, tuple(v)) for k, v in spec['filters'].items())))
+
+
+def _aggregate(group, source, dimensions, filters, measures):
+    """Sum measures of a source by dimensions, after applying filters.
+
+    group(keys, measures) sums the source by its own columns; looked-up
+    dimensions are then mapped on the much smaller grouped frame and regrouped.
+    """
+    needed = list(dict.fromkeys(dimensions + list(filters)))
+    keys = list(dict.fromkeys(c if c in SOURCE_KEYS[source] else LOOKUPS[c][0] for c in needed))
+    result = group(keys, measures)
+    looked_up = [c for c in needed if c not in result]
+    for column in looked_up:
+        key, lookup = LOOKUPS[column]
+        result[column] = lookup(result[key])
+    if looked_up:
+        result = result.dropna(subset=looked_up)
+    for column, values in filters.items():
+        result = result[result[column].isin(values)]
+    if keys != dimensions:
+        result = result.groupby(dimensions)[measures].sum().reset_index()
+    return result
+
+
+def plan(chart_ids):
+    """Return, per source table, the aggregates the charts need: (dimensions, filters) -> measures."""
+    scans = {}
+    for chart_id in chart_ids:
+        spec = registry[chart_id]
+        for source, measures in _base_measures(spec).items():
+            aggregate = scans.setdefault(source, {}).setdefault(_aggregate_key(spec), [])
+            aggregate.extend(m for m in measures if m not in aggregate)
+    return scans
+
+
+def chart_data(chart_ids, start=None, end=None, store=None):
+    """Compute the frame behind each chart, each distinct aggregate once."""
+    aggregates = {}
+    for source, requests in plan(chart_ids).items():
+        if query_backend.ENABLED:
+            def group(keys, measures, source=source):
+                return query_backend.group(source, keys, measures, start, end, store)
+        else:
+            def group(keys, measures, source=source):
+                return GROUPED[source](start, end, store, tuple(keys), tuple(measures))
+        for (dimensions, filters), measures in requests.items():
+            with metrics.stage('transform'):
+                aggregates[source, dimensions, filters] = _aggregate(group, source, list(dimensions),
+                                                                     {k: list(v) for k, v in filters},
+                                                                     measures)
+    data = {}
+    for chart_id in chart_ids:
+        spec = registry[chart_id]
+        dimensions, filters = _aggregate_key(spec)
+        frames = [aggregates[source, dimensions, filters] for source in _base_measures(spec)]
+        df = frames[0]
+        for other in frames[1:]:
+            if len(df) and len(other):
+                df = df.merge(other, on=list(dimensions), how='outer').fillna(0)
+            else:
+                # An outer join against no rows; the empty side's key dtypes may not even match
+                rows, empty = (df, other) if len(df) else (other, df)
+                df = rows.assign(**{column: 0 for column in empty.columns if column not in dimensions})
+        data[chart_id] = df
+    return data
+
+
+def render(chart_ids, start=None, end=None, store=None):
+    """Build the figures of several charts for one date range and store, in order."""
+    data = chart_data(chart_ids, start, end, store)
+    steps = len(chart_ids) + 1
+    routing.report_progress(1, steps)
+    rendered = []
+    for chart_id in chart_ids:
+        spec = registry[chart_id]
+        df = data[chart_id]
+        options = dict(spec['options'])
+        stored = [m for m in df.columns if m not in spec['dimensions']]
+        if spec['dimensions'] == ['date']:
+            # Charts sharing an aggregate share its bucket as well
+            bucket = resolution.choose_bucket(start, end, df)
+            df = resolution.bucket_series(df, stored, bucket)
+            options.setdefault('x_title', resolution.axis_title(bucket))
+        for measure in spec['measures']:
+            if measure in DERIVED:
+                df = df.assign(**{measure: DERIVED[measure][1](df)})
+        if 'top' in options:
+            df = df.nlargest(options.pop('top'), spec['measures'][0])
+        rendered.append(VISUALS[spec['visual']](df, spec['dimensions'], spec['measures'], **options))
+        routing.report_progress(len(rendered) + 1, steps)
+    return tuple(rendered)
+
+
+def _line(df, dimensions, measures, color=figures.GOLD, x_title=None, y_title=None, layout=None):
+    df = resolution.downsample(df, measures[0])
+    return figures.figure(figures.line(df[dimensions[0]], df[measures[0]], color),
+                          x_title=x_title, y_title=y_title, **(layout or {}))
+
+
+def _lines(df, dimensions, measures, names, colors, widths, dashes=None, x_title=None, y_title=None, layout=None):
+    traces = []
+    for i, measure in enumerate(measures):
+        series = resolution.downsample(df[[dimensions[0], measure]], measure)
+        traces.append(figures.line(series[dimensions[0]], series[measure], colors[i], name=names[i],
+                                   width=widths[i], dash=(dashes or [None] * len(measures))[i]))
+    return figures.figure(*traces, x_title=x_title, y_title=y_title, **(layout or {}))
+
+
+def _area(df, dimensions, measures, color=figures.GOLD, x_title=None, y_title=None, layout=None):
+    df = resolution.downsample(df, measures[0])
+    return figures.figure(figures.line(df[dimensions[0]], df[measures[0]], color, fill='tozeroy'),
+                          x_title=x_title, y_title=y_title, **(layout or {}))
+
+
+def _bar(df, dimensions, measures, color=figures.GOLD, x_title=None, y_title=None, layout=None):
+    return figures.figure(figures.bar(df[dimensions[0]], df[measures[0]], color),
+                          x_title=x_title, y_title=y_title, **(layout or {}))
+
+
+def _hbar(df, dimensions, measures, color=figures.GOLD, x_title=None, y_title=None, layout=None):
+    return figures.figure(figures.bar(df[measures[0]].to_numpy(), df[dimensions[0]], color, orientation='h'),
+                          x_title=x_title, y_title=y_title, yaxis={'categoryorder': 'total ascending'},
+                          **(layout or {}))
+
+
+def _pie(df, dimensions, measures, colors=figures.PALETTE, layout=None):
+    return figures.figure(figures.pie(df[dimensions[0]], df[measures[0]], colors), **(layout or {}))
+
+
+def _bubbles(df, dimensions, measures, size, group, text, x_title=None, y_title=None, layout=None):
+    bubbles = figures.bubbles(df[measures[0]], df[measures[1]], df[size], df[group], df[text])
+    return figures.figure(*bubbles, x_title=x_title, y_title=y_title, legend_title_text=group,
+                          **(layout or {}))
+
+
+def _sunburst(df, dimensions, measures, parent, label, colors=figures.PALETTE, layout=None):
+    return figures.figure(figures.sunburst(df[parent], df[label], df[measures[0]], colors), **(layout or {}))
+
+
+def _heatmap(df, dimensions, measures, rows=None, z_title=None, x_title=None, y_title=None, layout=None):
+    grid = df.pivot_table(index=dimensions[0], columns=dimensions[1], values=measures[0],
+                          aggfunc='sum', fill_value=0)
+    if rows is not None:
+        grid = grid.reindex(rows, fill_value=0)
+    return figures.figure(figures.heatmap(grid.to_numpy(), grid.columns.to_numpy(), list(grid.index), z_title=z_title),
+                          x_title=x_title, y_title=y_title, **(layout or {}))
+
+
+# Visual type -> builder taking the chart's frame, dimensions, measures and options
+VISUALS = {
+    'line': _line,
+    'lines': _lines,
+    'area': _area,
+    'bar': _bar,
+    'hbar': _hbar,
+    'pie': _pie,
+    'bubbles': _bubbles,
+    'sunburst': _sunburst,
+    'heatmap': _heatmap,
+}
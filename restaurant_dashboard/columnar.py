@@ -0,0 +1,126 @@
+"""Typed columnar (Parquet/Feather) storage for the data directory.
+
+Convert the CSVs in data/ with:
+
+    python columnar.py --format parquet
+
+and start the dashboard with DASHBOARD_STORAGE=parquet to read them.
+Both formats need pyarrow installed.
+"""
+import argparse
+
+import pandas as pd
+
+import utils
+
+FORMATS = {
+    'parquet': 'parquet',
+    'feather': 'feather',
+}
+
+# Column dtypes stored for each table
+SCHEMAS = {
+    'sales': {
+        'date': 'datetime64[ns]',
+        'dish_id': 'int16',
+        'quantity': 'int16',
+        'total_price': 'float64',
+        'hour': 'int8',
+        'store_id': 'int16',
+    },
+    'menu': {
+        'dish_id': 'int16',
+        'dish_name': 'string',
+        'category': 'category',
+        'price': 'float64',
+    },
+    'expenses': {
+        'date': 'datetime64[ns]',
+        'category': 'category',
+        'amount': 'float64',
+        'store_id': 'int16',
+    },
+}
+
+
+def table_path(name, fmt):
+    """Get the path of a table stored in a columnar format."""
+    return utils.get_data_path(f'{name}.{FORMATS[fmt]}')
+
+
+def apply_schema(df, name):
+    """Cast a frame to the stored schema of a table."""
+    schema = {col: dtype for col, dtype in SCHEMAS[name].items() if col in df.columns}
+    return df.astype(schema)
+
+
+def write_table(df, name, fmt, path=None):
+    """Write a frame as a typed columnar table."""
+    df = apply_schema(df, name).reset_index(drop=True)
+    path = path or table_path(name, fmt)
+    if fmt == 'parquet':
+        df.to_parquet(path, index=False)
+    else:
+        df.to_feather(path)
+    return path
+
+
+def read_file(path, columns=None):
+    """Read a columnar file, optionally only some of its columns."""
+    if path.endswith('.feather'):
+        return pd.read_feather(path, columns=columns)
+    return pd.read_parquet(path, columns=columns)
+
+
+def iter_file(path, columns=None, chunk_rows=1_000_000):
+    """Yield a columnar file as frames of at most chunk_rows rows.
+
+    Parquet is read batch by batch; Feather is memory-mapped and sliced.
+    Columns the file does not have are skipped.
+    """
+    if path.endswith('.feather'):
+        import pyarrow.feather as feather
+
+        table = feather.read_table(path, memory_map=True)
+        if columns is not None:
+            table = table.select([column for column in columns if column in table.column_names])
+        for start in range(0, table.num_rows, chunk_rows):
+            yield table.slice(start, chunk_rows).to_pandas()
+        return
+    import pyarrow.parquet as pq
+
+    parquet = pq.ParquetFile(path)
+    if columns is not None:
+        columns = [column for column in columns if column in parquet.schema_arrow.names]
+    for batch in parquet.iter_batches(batch_size=chunk_rows, columns=columns):
+        yield batch.to_pandas()
+
+
+def read_table(name, fmt, columns=None):
+    """Read a columnar table, optionally only some of its columns."""
+    return read_file(table_path(name, fmt), columns)
+
+
+def convert(fmt, names=None):
+    """Convert CSV tables in the data directory to a columnar format."""
+    paths = []
+    for name in names or SCHEMAS:
+        df = pd.read_csv(utils.get_data_path(f'{name}.csv'))
+        paths.append(write_table(df, name, fmt))
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert the dashboard CSVs to a columnar format.")
+    parser.add_argument('--format', choices=sorted(FORMATS), default='parquet')
+    parser.add_argument('tables', nargs='*', help="Tables to convert (default: all)")
+    args = parser.parse_args()
+    unknown = set(args.tables) - set(SCHEMAS)
+    if unknown:
+        parser.error(f"unknown tables: {', '.join(sorted(unknown))}")
+    for path in convert(args.format, args.tables):
+        print(f"Wrote {path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,72 +1,181 @@
-import pandas as pd
+"""Generate synthetic restaurant data.
+
+    python generate_data.py                          # 30 days, 1 store, 12 dishes
+    python generate_data.py --days 3650 --stores 20 --orders-per-day 2000 --format parquet
+
+Sales are drawn a whole column at a time with a seeded numpy Generator and
+written in chunks of about --chunk-rows rows, so memory stays bounded at any
+volume. Each day is drawn from its own seed-derived stream, so the output
+depends only on the options, not on the chunk size or the day it is run.
+"""
+import argparse
+import os
+import sys
+from datetime import date, timedelta
+
 import numpy as np
-from datetime import datetime, timedelta
+import pandas as pd
 
-# Set seed for reproducibility
-np.random.seed(42)
+current_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(current_dir))
+import columnar
 
 # 1. Menu Items
 dishes = [
-    "Truffle Pasta", "Classic Burger", "Margherita Pizza", "Grilled Salmon", 
-    "Caesar Salad", "Steak Frites", "Mushroom Risotto", "Chicken Wings", 
+    "Truffle Pasta", "Classic Burger", "Margherita Pizza", "Grilled Salmon",
+    "Caesar Salad", "Steak Frites", "Mushroom Risotto", "Chicken Wings",
     "Tacos al Pastor", "Sushi Platter", "Chocolate Lava Cake", "Tiramisu"
 ]
 categories = ["Main", "Main", "Main", "Main", "Appetizer", "Main", "Main", "Appetizer", "Main", "Main", "Dessert", "Dessert"]
 prices = [24.99, 16.50, 14.00, 28.00, 12.50, 32.00, 22.00, 10.00, 15.00, 35.00, 9.00, 8.50]
 
-menu_df = pd.DataFrame({
-    'dish_id': range(1, len(dishes) + 1),
-    'dish_name': dishes,
-    'category': categories,
-    'price': prices
-})
-
-# 2. Sales Data (Last 30 days)
-dates = [datetime.now() - timedelta(days=x) for x in range(30)]
-sales_records = []
-
-for date in dates:
-    # Number of orders per day
-    num_orders = np.random.randint(40, 100)
-    for _ in range(num_orders):
-        dish_idx = np.random.choice(len(dishes))
-        quantity = np.random.randint(1, 4)
-        sales_records.append({
-            'date': date.strftime('%Y-%m-%d'),
-            'dish_id': dish_idx + 1,
-            'quantity': quantity,
-            'total_price': quantity * prices[dish_idx],
-            'hour': np.random.randint(11, 23) # 11 AM to 11 PM
-        })
-
-sales_df = pd.DataFrame(sales_records)
-
-# 3. Expenses Data
 expenses_categories = ["Ingredients", "Labor", "Rent", "Utilities", "Marketing"]
-expenses_records = []
-for date in dates:
-    for cat in expenses_categories:
-        if cat == "Rent":
-            amount = 200 if date.day == 1 else 0
-        elif cat == "Labor":
-            amount = np.random.uniform(300, 500)
+
+# Opening hours: orders fall between 11 AM and 11 PM
+FIRST_HOUR, LAST_HOUR = 11, 23
+
+# Fixed so that a seed reproduces the same files on any day
+DEFAULT_END_DATE = '2025-12-31'
+
+
+def generate_menu(num_dishes, rng):
+    """Build the dish catalog, padding the base menu with synthetic dishes."""
+    extra = max(num_dishes - len(dishes), 0)
+    return pd.DataFrame({
+        'dish_id': range(1, num_dishes + 1),
+        'dish_name': (dishes + [f"Dish {i}" for i in range(len(dishes) + 1, num_dishes + 1)])[:num_dishes],
+        'category': (categories + list(rng.choice(["Main", "Appetizer", "Dessert"], extra)))[:num_dishes],
+        'price': (prices + list(np.round(rng.uniform(8, 40, extra), 2)))[:num_dishes],
+    })
+
+
+def generate_sales_day(day_index, day, args, dish_prices):
+    """Draw every order line of one day, for all stores, as whole columns."""
+    rng = np.random.default_rng([args.seed, day_index])
+    low, high = max(args.orders_per_day // 2, 1), args.orders_per_day * 3 // 2 + 1
+    orders = rng.integers(low, high, size=args.stores)
+    n = int(orders.sum())
+    dish_idx = rng.integers(0, len(dish_prices), n)
+    quantity = rng.integers(1, 4, n)
+    columns = {
+        'date': np.full(n, day.strftime('%Y-%m-%d'), dtype=object),
+        'dish_id': dish_idx + 1,
+        'quantity': quantity,
+        'total_price': quantity * dish_prices[dish_idx],
+        'hour': rng.integers(FIRST_HOUR, LAST_HOUR, n),
+    }
+    if args.stores > 1:
+        columns['store_id'] = np.repeat(np.arange(1, args.stores + 1), orders)
+    return pd.DataFrame(columns)
+
+
+def generate_expenses(days, args):
+    """Draw the daily expenses of every store."""
+    rng = np.random.default_rng([args.seed, len(days), args.stores])
+    n_days, n_cats = len(days), len(expenses_categories)
+    shape = (n_days, args.stores, n_cats)
+    amounts = rng.uniform(50, 150, shape)
+    labor = expenses_categories.index("Labor")
+    rent = expenses_categories.index("Rent")
+    amounts[:, :, labor] = rng.uniform(300, 500, shape[:2])
+    first_of_month = np.array([day.day == 1 for day in days])
+    amounts[:, :, rent] = np.where(first_of_month[:, None], 200.0, 0.0)
+
+    day_idx, store_idx, cat_idx = np.indices(shape).reshape(3, -1)
+    amounts = amounts.reshape(-1)
+    keep = amounts > 0
+    date_strings = np.array([day.strftime('%Y-%m-%d') for day in days], dtype=object)
+    columns = {
+        'date': date_strings[day_idx[keep]],
+        'category': np.array(expenses_categories, dtype=object)[cat_idx[keep]],
+        'amount': amounts[keep],
+    }
+    if args.stores > 1:
+        columns['store_id'] = store_idx[keep] + 1
+    return pd.DataFrame(columns)
+
+
+class TableWriter:
+    """Write a table chunk by chunk as CSV, Parquet or Feather."""
+
+    def __init__(self, name, fmt, output_dir):
+        self.name = name
+        self.fmt = fmt
+        ext = 'csv' if fmt == 'csv' else columnar.FORMATS[fmt]
+        self.path = os.path.join(output_dir, f'{name}.{ext}')
+        self._writer = None
+        self._first = True
+
+    def write(self, df):
+        if self.fmt == 'csv':
+            df.to_csv(self.path, mode='w' if self._first else 'a', header=self._first, index=False)
         else:
-            amount = np.random.uniform(50, 150)
-        
-        if amount > 0:
-            expenses_records.append({
-                'date': date.strftime('%Y-%m-%d'),
-                'category': cat,
-                'amount': amount
-            })
-
-expenses_df = pd.DataFrame(expenses_records)
-
-# Save to CSV in the current directory (data/)
-import os
-current_dir = os.path.dirname(os.path.abspath(__file__))
-menu_df.to_csv(os.path.join(current_dir, 'menu.csv'), index=False)
-sales_df.to_csv(os.path.join(current_dir, 'sales.csv'), index=False)
-expenses_df.to_csv(os.path.join(current_dir, 'expenses.csv'), index=False)
+            import pyarrow as pa
+            table = pa.Table.from_pandas(columnar.apply_schema(df, self.name), preserve_index=False)
+            if self._writer is None:
+                if self.fmt == 'parquet':
+                    import pyarrow.parquet as pq
+                    self._writer = pq.ParquetWriter(self.path, table.schema)
+                else:
+                    import pyarrow.ipc as ipc
+                    self._writer = ipc.new_file(self.path, table.schema)
+            self._writer.write_table(table)
+        self._first = False
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate sample restaurant data.")
+    parser.add_argument('--days', type=int, default=30, help="Days of history, ending on --end-date")
+    parser.add_argument('--end-date', default=DEFAULT_END_DATE,
+                        help=f"Last day of history, YYYY-MM-DD or 'today' (default: {DEFAULT_END_DATE})")
+    parser.add_argument('--stores', type=int, default=1,
+                        help="Number of stores (adds a store_id column when above 1)")
+    parser.add_argument('--orders-per-day', type=int, default=70,
+                        help="Average order lines per store per day")
+    parser.add_argument('--dishes', type=int, default=len(dishes), help="Dish catalog size")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--chunk-rows', type=int, default=1_000_000,
+                        help="Approximate sales rows generated and written at a time")
+    parser.add_argument('--format', choices=['csv'] + sorted(columnar.FORMATS), default='csv',
+                        help="Storage format to write (columnar formats need pyarrow)")
+    parser.add_argument('--output-dir', default=current_dir)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    menu_df = generate_menu(args.dishes, rng)
+    dish_prices = menu_df['price'].to_numpy()
+
+    end = date.today() if args.end_date == 'today' else date.fromisoformat(args.end_date)
+    days = [end - timedelta(days=x) for x in range(args.days - 1, -1, -1)]
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    menu_writer = TableWriter('menu', args.format, args.output_dir)
+    menu_writer.write(menu_df)
+    menu_writer.close()
+
+    expenses_writer = TableWriter('expenses', args.format, args.output_dir)
+    expenses_writer.write(generate_expenses(days, args))
+    expenses_writer.close()
+
+    # Group whole days into chunks of roughly chunk_rows order lines
+    days_per_chunk = max(args.chunk_rows // max(args.orders_per_day * args.stores, 1), 1)
+    sales_writer = TableWriter('sales', args.format, args.output_dir)
+    total_rows = 0
+    for chunk_start in range(0, len(days), days_per_chunk):
+        chunk = pd.concat([
+            generate_sales_day(day_index, days[day_index], args, dish_prices)
+            for day_index in range(chunk_start, min(chunk_start + days_per_chunk, len(days)))
+        ], ignore_index=True)
+        sales_writer.write(chunk)
+        total_rows += len(chunk)
+    sales_writer.close()
+
+    print(f"Data generated successfully! ({total_rows:,} order lines)")
+
 
-print("Data generated successfully!")
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,238 @@
+import hashlib
+import io
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+import pandas as pd
+
+import columnar
+import metrics
+import partitions
+import utils
+
+# Table name -> file in the data directory
+TABLES = {
+    'sales': 'sales.csv',
+    'menu': 'menu.csv',
+    'expenses': 'expenses.csv',
+}
+
+# 'csv', or one of the columnar formats written by columnar.py
+STORAGE_FORMAT = os.environ.get('DASHBOARD_STORAGE', 'csv')
+
+# Rows parsed at a time when data files are streamed into aggregates
+CHUNK_ROWS = int(os.environ.get('DASHBOARD_CHUNK_ROWS', 1_000_000))
+
+# Bytes at the start of a CSV, and before the offset it was read to, that must be unchanged for it to count as appended to
+FINGERPRINT_BYTES = 4096
+
+# Seconds a data version published by the refresh scheduler is served after it was last confirmed current
+MAX_STALENESS = float(os.environ.get('DASHBOARD_MAX_STALENESS', 60))
+
+# (file path, columns) -> (file signature, frame)
+_cache = {}
+_lock = threading.Lock()
+
+# (file path -> signature, time last confirmed) published by the refresh scheduler
+_published = None
+_local = threading.local()
+
+
+def file_signature(path):
+    """Return the (mtime, size) pair used to detect a changed data file."""
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def table_path(name):
+    """Get the path a table is read from with the configured storage format."""
+    if STORAGE_FORMAT == 'csv':
+        return utils.get_data_path(TABLES[name])
+    return columnar.table_path(name, STORAGE_FORMAT)
+
+
+def data_paths():
+    """Return every file the dashboard reads: the sales table or its partitions, menu and expenses."""
+    return partitions.sales_paths() + [table_path('menu'), table_path('expenses')]
+
+
+def current_signatures():
+    """Return the live signature of every data file."""
+    return {path: file_signature(path) for path in data_paths()}
+
+
+def publish(signatures):
+    """Serve the data version described by signatures to requests.
+
+    Until the next publish, requests see this version as long as it was
+    published (or re-confirmed) less than MAX_STALENESS seconds ago, even if
+    the files have changed since.
+    """
+    global _published
+    _published = (signatures, time.monotonic())
+
+
+def published_signatures():
+    """Return the signatures last published, or None."""
+    return None if _published is None else _published[0]
+
+
+@contextmanager
+def pinned(signatures):
+    """Make version checks on this thread see the given signatures, e.g. while precomputing them."""
+    _local.signatures = signatures
+    try:
+        yield
+    finally:
+        _local.signatures = None
+
+
+def version_signature(path):
+    """Return the signature of the version of a file that requests should be served."""
+    signatures = getattr(_local, 'signatures', None)
+    published = _published
+    if signatures is None and published is not None and time.monotonic() - published[1] <= MAX_STALENESS:
+        signatures = published[0]
+    if signatures is not None and path in signatures:
+        return signatures[path]
+    return file_signature(path)
+
+
+def data_version(*names):
+    """Return a token that changes whenever any of the named tables changes."""
+    return tuple(version_signature(table_path(name)) for name in names)
+
+
+def dataset_version():
+    """Return a token that changes whenever any data file, or sales partition, changes."""
+    return tuple(version_signature(path) for path in data_paths())
+
+
+def read_file(path, columns=None):
+    """Read a CSV or columnar data file, optionally only some of its columns."""
+    with metrics.stage('load'):
+        if path.endswith('.csv'):
+            df = pd.read_csv(path, usecols=columns)
+        else:
+            df = columnar.read_file(path, columns)
+    metrics.add_rows('load', len(df))
+    return df
+
+
+class ByteRange(io.RawIOBase):
+    """A read-only view of the next size bytes of an open file."""
+
+    def __init__(self, f, size):
+        self._f = f
+        self._left = size
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        data = self._f.read(min(len(buffer), self._left))
+        buffer[:len(data)] = data
+        self._left -= len(data)
+        return len(data)
+
+
+def lines_end(f, size):
+    """Return the offset just past the last complete line of the file."""
+    end = size
+    while end > 0:
+        start = max(end - 65536, 0)
+        f.seek(start)
+        newline = f.read(end - start).rfind(b'\n')
+        if newline >= 0:
+            return start + newline + 1
+        end = start
+    return 0
+
+
+def fingerprint(f, offset):
+    """Identify the first offset bytes of an open file: its inode and a hash of their first and last blocks."""
+    f.seek(0)
+    head = f.read(min(offset, FINGERPRINT_BYTES))
+    f.seek(max(offset - FINGERPRINT_BYTES, 0))
+    tail = f.read(offset - f.tell())
+    return f'{os.fstat(f.fileno()).st_ino}:{hashlib.sha1(head + tail).hexdigest()}'
+
+
+def is_append(f, size, offset, known):
+    """Whether an open file only had lines appended since it was size bytes long, read to offset and fingerprinted.
+
+    The file must have strictly grown, as the same file, with the bytes read
+    so far unchanged at both ends; anything else counts as a rewrite.
+    """
+    return os.fstat(f.fileno()).st_size > size and fingerprint(f, offset) == known
+
+
+def iter_lines(f, start, end, columns, usecols=None, dtype=None, chunk_rows=None):
+    """Yield the CSV lines between two offsets of an open file as frames of at most chunk_rows rows.
+
+    columns names the fields of each line, since the header is not in the range.
+    """
+    f.seek(start)
+    lines = io.BufferedReader(ByteRange(f, end - start))
+    with pd.read_csv(lines, header=None, names=columns, usecols=usecols, dtype=dtype,
+                     chunksize=chunk_rows or CHUNK_ROWS) as chunks:
+        with metrics.stage('load'):
+            chunk = next(chunks, None)
+        while chunk is not None:
+            metrics.add_rows('load', len(chunk))
+            yield chunk
+            with metrics.stage('load'):
+                chunk = next(chunks, None)
+
+
+def iter_chunks(path, columns=None, dtype=None, chunk_rows=None):
+    """Yield a CSV or columnar data file as frames of at most chunk_rows rows.
+
+    Only the listed columns that the file has are read. dtype sets the parse
+    dtypes of CSV columns; columnar files keep their stored types.
+    """
+    chunk_rows = chunk_rows or CHUNK_ROWS
+    if path.endswith('.csv'):
+        usecols = None if columns is None else set(columns).__contains__
+        chunks = pd.read_csv(path, usecols=usecols, dtype=dtype, chunksize=chunk_rows)
+    else:
+        chunks = columnar.iter_file(path, columns, chunk_rows)
+    with metrics.stage('load'):
+        chunk = next(chunks, None)
+    while chunk is not None:
+        metrics.add_rows('load', len(chunk))
+        yield chunk
+        with metrics.stage('load'):
+            chunk = next(chunks, None)
+
+
+def get_file(path, columns=None):
+    """Return the shared frame for a data file, parsing it only when it changed.
+
+    The frame is shared between every caller in the process, so callers get a
+    shallow copy and must treat the data as read-only. Passing columns reads
+    (and caches) only those columns.
+    """
+    key = (path, tuple(columns) if columns is not None else None)
+    signature = file_signature(path)
+    entry = _cache.get(key)
+    if entry is None or entry[0] != signature:
+        with _lock:
+            entry = _cache.get(key)
+            if entry is None or entry[0] != signature:
+                entry = (signature, read_file(path, columns))
+                _cache[key] = entry
+    return entry[1].copy(deep=False)
+
+
+def get_table(name, columns=None):
+    """Return the shared frame for a table; see get_file."""
+    return get_file(table_path(name), columns)
+
+
+def clear():
+    """Drop every cached table."""
+    with _lock:
+        _cache.clear()
@@ -0,0 +1,35 @@
+import functools
+import json
+
+import plotly.io as pio
+
+import cache_backends
+import data_store
+import metrics
+
+
+def cached_figure(func):
+    """Serve a figure callback (single or multi-output) from the cache while its inputs and the data are unchanged.
+
+    Figures are stored as serialized JSON in the configured cache backend, so
+    a hit skips both the pandas and the Plotly work and only decodes the
+    stored payload for Dash.
+    """
+    callback_id = f'{func.__module__}.{func.__name__}'
+
+    @functools.wraps(func)
+    def wrapper(*args):
+        if cache_backends.MAX_BYTES <= 0:
+            return func(*args)
+        version = data_store.dataset_version()
+        backend = cache_backends.get_backend()
+        key = cache_backends.make_key('figure', callback_id, json.dumps(args, sort_keys=True, default=str), version)
+        payload = backend.get(key)
+        if payload is None:
+            figures = func(*args)
+            with metrics.stage('serialize'):
+                payload = pio.json.to_json_plotly(figures)
+            backend.set(key, payload)
+        with metrics.stage('serialize'):
+            return json.loads(payload)
+    return wrapper
@@ -0,0 +1,83 @@
+"""Plotly figures built directly from reduced aggregates.
+
+Pages hand these helpers arrays that are already aggregated (a series per
+date, a category/dish tree, a day-of-week by hour matrix) and get back
+graph_objects traces styled with the dashboard's yellow and black palette.
+Unlike plotly.express, nothing here groups, bins or reshapes the data, so
+building a figure, and the size of its JSON, depends only on the number of
+points drawn.
+"""
+import plotly.graph_objects as go
+
+GOLD = '#FFD700'
+BLACK = '#000000'
+
+# Colors given to categories, in order of appearance
+PALETTE = [BLACK, GOLD, '#808080', '#C0C0C0', '#E0E0E0']
+
+# White through gold to black, for heatmaps
+SCALE = ['#FFFFFF', GOLD, BLACK]
+
+
+def figure(*traces, x_title=None, y_title=None, **layout):
+    """Combine traces into a figure with the given axis titles and layout settings."""
+    fig = go.Figure(data=list(traces))
+    fig.update_layout(xaxis_title=x_title, yaxis_title=y_title, **layout)
+    return fig
+
+
+def line(x, y, color=GOLD, name=None, width=2, dash=None, fill=None):
+    """A line through (x, y); fill='tozeroy' shades the area beneath it."""
+    return go.Scatter(x=x, y=y, name=name, mode='lines', fill=fill,
+                      line=dict(color=color, width=width, dash=dash))
+
+
+def bar(x, y, color=GOLD, name=None, orientation='v'):
+    """Bars of y over x; with orientation='h', bars of x along y."""
+    return go.Bar(x=x, y=y, name=name, orientation=orientation, marker_color=color)
+
+
+def pie(labels, values, colors=PALETTE):
+    """A pie with one slice per label, colored from colors in order."""
+    return go.Pie(labels=labels, values=values,
+                  marker_colors=[colors[i % len(colors)] for i in range(len(labels))])
+
+
+def bubbles(x, y, size, groups, text, colors=PALETTE, max_size=20):
+    """One scatter trace per group, with marker areas proportional to size and labelled by text.
+
+    Returns a list of traces; the largest marker is max_size pixels across.
+    """
+    sizeref = 2.0 * max(size.max(), 1e-9) / max_size ** 2
+    traces = []
+    for i, group in enumerate(groups.unique()):
+        rows = (groups == group).to_numpy()
+        traces.append(go.Scatter(
+            x=x[rows], y=y[rows], name=str(group), mode='markers+text',
+            text=text[rows], hovertext=text[rows], textposition='top center',
+            marker=dict(color=colors[i % len(colors)], size=size[rows], sizemode='area', sizeref=sizeref),
+        ))
+    return traces
+
+
+def sunburst(parents, labels, values, colors=PALETTE):
+    """A two-level sunburst from leaf rows: each leaf's parent, label and value.
+
+    Parent totals are summed from their leaves, and each leaf takes its
+    parent's color.
+    """
+    totals = values.groupby(parents.to_numpy(), sort=False).sum()
+    color_of = {parent: colors[i % len(colors)] for i, parent in enumerate(totals.index)}
+    return go.Sunburst(
+        ids=list(totals.index) + [f'{parent}/{label}' for parent, label in zip(parents, labels)],
+        labels=list(totals.index) + list(labels),
+        parents=[''] * len(totals) + list(parents),
+        values=list(totals) + list(values),
+        branchvalues='total',
+        marker_colors=[color_of[parent] for parent in totals.index] + [color_of[parent] for parent in parents],
+    )
+
+
+def heatmap(z, x, y, colorscale=SCALE, z_title=None):
+    """A heatmap of a matrix with one row per y and one column per x."""
+    return go.Heatmap(z=z, x=x, y=y, colorscale=colorscale, colorbar_title_text=z_title)
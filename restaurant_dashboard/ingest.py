@@ -0,0 +1,417 @@
+"""Durable ingest of POS order lines and expense entries.
+
+Batches are validated column-wise, then committed to a SQLite store in
+WAL mode (DASHBOARD_INGEST_DB, by default data/pos.sqlite) by one writer
+thread per process. The writer groups every batch waiting at the time into
+one transaction, so many terminals share each commit. Once committed, the
+new rows are appended to the CSV data files the dashboard reads. The
+appends change the files' signatures, and with them the data version the
+rollups and figure caches key on, and they are folded in incrementally.
+
+Set DASHBOARD_INGEST=1 to accept batches over HTTP:
+
+    POST /ingest/sales     {"batch_id": "till-3-000187", "rows": [{"date": "2024-05-01", ...}]}
+    POST /ingest/expenses  {"rows": [...]}
+
+or load a file of rows from the command line:
+
+    python ingest.py sales new_orders.csv
+
+A batch_id makes retries safe: a batch already stored is acknowledged but
+not stored again. With DASHBOARD_INGEST_TOKEN set, requests must send it as
+a bearer token.
+"""
+import argparse
+import fcntl
+import logging
+import os
+import queue
+import sqlite3
+import threading
+
+import numpy as np
+import pandas as pd
+
+import data_store
+import partitions
+import rollups
+import utils
+
+ENABLED = os.environ.get('DASHBOARD_INGEST', '0').lower() not in ('', '0', 'false')
+
+TOKEN = os.environ.get('DASHBOARD_INGEST_TOKEN')
+
+# Most rows committed in one transaction
+MAX_COMMIT_ROWS = 50_000
+
+# Most validation errors reported for a rejected batch
+MAX_ERRORS = 100
+
+# Table -> column -> (SQL type, required); store_id defaults to the single store
+COLUMNS = {
+    'sales': {
+        'date': ('TEXT', True),
+        'dish_id': ('INTEGER', True),
+        'quantity': ('INTEGER', True),
+        'total_price': ('REAL', True),
+        'hour': ('INTEGER', True),
+        'store_id': ('INTEGER', False),
+    },
+    'expenses': {
+        'date': ('TEXT', True),
+        'category': ('TEXT', True),
+        'amount': ('REAL', True),
+        'store_id': ('INTEGER', False),
+    },
+}
+
+logger = logging.getLogger(__name__)
+
+_writer = None
+_lock = threading.Lock()
+
+
+class ValidationError(ValueError):
+    """A batch was rejected; errors lists (row, message) pairs."""
+
+    def __init__(self, errors):
+        super().__init__(f"{len(errors)} invalid rows")
+        self.errors = errors
+
+
+def default_path():
+    """Get the SQLite file ingested rows are stored in."""
+    return os.environ.get('DASHBOARD_INGEST_DB') or utils.get_data_path('pos.sqlite')
+
+
+def _numbers(values):
+    """Parse numbers, treating booleans, which pandas would read as 0 and 1, as invalid."""
+    booleans = values.map(lambda value: isinstance(value, (bool, np.bool_)))
+    return pd.to_numeric(values.mask(booleans), errors='coerce')
+
+
+def _integers(values):
+    numbers = _numbers(values)
+    return numbers.where(numbers == np.floor(numbers))
+
+
+def validate(table, rows):
+    """Check and coerce a batch of rows for a table, all rows at once.
+
+    Returns a frame with the table's columns and types, or raises
+    ValidationError listing the offending rows.
+    """
+    df = pd.DataFrame(rows).reset_index(drop=True)
+    missing = [column for column, (_, required) in COLUMNS[table].items() if required and column not in df]
+    if missing:
+        raise ValidationError([(None, f"missing columns: {', '.join(missing)}")])
+    if 'store_id' not in df:
+        df['store_id'] = rollups.DEFAULT_STORE
+
+    dates = pd.to_datetime(df['date'], format='%Y-%m-%d', errors='coerce')
+    out = pd.DataFrame({'date': dates.dt.strftime('%Y-%m-%d')})
+    checks = [(dates.isna(), "date must be YYYY-MM-DD")]
+    store_ids = _integers(df['store_id'])
+    checks.append((~(store_ids >= 1), "store_id must be a positive integer"))
+    if data_store.STORAGE_FORMAT == 'csv' and 'store_id' not in _file_columns(table):
+        # The rows could never be appended to a single-store data file
+        checks.append((store_ids.notna() & (store_ids != rollups.DEFAULT_STORE),
+                       f"store_id must be {rollups.DEFAULT_STORE}: the {table} data has no store_id column"))
+    if table == 'sales':
+        dish_ids = _integers(df['dish_id'])
+        quantity = _integers(df['quantity'])
+        total_price = _numbers(df['total_price'])
+        hour = _integers(df['hour'])
+        checks += [
+            (~dish_ids.isin(rollups.menu_dimension().index), "dish_id is not on the menu"),
+            (~(quantity > 0), "quantity must be a positive integer"),
+            (~(total_price >= 0), "total_price must be a non-negative number"),
+            (~hour.between(0, 23), "hour must be an integer from 0 to 23"),
+        ]
+        out = out.assign(dish_id=dish_ids, quantity=quantity, total_price=total_price, hour=hour)
+    else:
+        category = df['category'].astype('string').str.strip()
+        amount = _numbers(df['amount'])
+        checks += [
+            (category.isna() | (category == ''), "category must be a non-empty string"),
+            (~(amount >= 0), "amount must be a non-negative number"),
+        ]
+        out = out.assign(category=category, amount=amount)
+    out['store_id'] = store_ids
+
+    errors = []
+    for failed, message in checks:
+        errors.extend((int(row), message) for row in np.flatnonzero(failed.fillna(True).to_numpy()))
+    if errors:
+        raise ValidationError(sorted(errors)[:MAX_ERRORS])
+    return out.astype({column: 'int64' for column, (kind, _) in COLUMNS[table].items() if kind == 'INTEGER'})
+
+
+def connect(path=None):
+    """Open the ingest store in WAL mode, creating its tables if needed."""
+    conn = sqlite3.connect(path or default_path(), timeout=30, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    # Commits survive an application crash; only a power loss can drop the most recent ones
+    conn.execute("PRAGMA synchronous=NORMAL")
+    for table, columns in COLUMNS.items():
+        definition = ', '.join(f'{column} {kind} NOT NULL' for column, (kind, _) in columns.items())
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY, {definition})")
+    conn.execute("CREATE TABLE IF NOT EXISTS batches (batch_id TEXT PRIMARY KEY)")
+    conn.execute("CREATE TABLE IF NOT EXISTS exported (name TEXT PRIMARY KEY, last_id INTEGER NOT NULL)")
+    return conn
+
+
+def _header(path):
+    with open(path) as f:
+        return f.readline().strip().split(',')
+
+
+def _file_columns(table):
+    """Columns of the CSV data file a table's rows are appended to (the newest partition for sales)."""
+    existing = partitions.list_partitions() if table == 'sales' else []
+    return _header(existing[-1][1] if existing else data_store.table_path(table))
+
+
+def _partition_path(key, columns):
+    """Path of the sales partition for a key, created with the table's header if new."""
+    path = os.path.join(partitions.partition_dir(), key + '.csv')
+    if not os.path.exists(path):
+        with open(path, 'w') as f:
+            f.write(','.join(columns) + '\n')
+    return path
+
+
+def _append(path, df, columns):
+    """Append rows to a CSV data file in its column order, as complete lines in one write."""
+    data = df[columns].to_csv(index=False, header=False).encode()
+    with open(path, 'ab') as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _check_storage():
+    if data_store.STORAGE_FORMAT != 'csv':
+        raise ValueError("Ingest appends to CSV data files; columnar tables must be rebuilt with columnar.py")
+
+
+def _next_run(table, df):
+    """Split off the leading rows that go to the same data file: (path, rows)."""
+    existing = partitions.list_partitions() if table == 'sales' else []
+    if not existing:
+        return data_store.table_path(table), df
+    keys = df['date'].str[:len(existing[0][0])]
+    run = keys.ne(keys.iloc[0]).cumsum() == 0
+    return _partition_path(keys.iloc[0], _file_columns(table)), df[run.to_numpy()]
+
+
+def _export_table(conn, table):
+    """Append a table's rows not yet exported, one data file at a time, and return how many.
+
+    Each append is recorded in the transaction that read its rows, and
+    holding the store's write lock makes one process at a time export, in
+    commit order. No row is skipped, but the append and its record are not
+    atomic: a crash between them appends those rows again on the next export.
+    """
+    columns = COLUMNS[table]
+    count = 0
+    while True:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT last_id FROM exported WHERE name = ?", [table]).fetchone()
+            df = pd.read_sql_query(f"SELECT id, {', '.join(columns)} FROM {table} WHERE id > ? ORDER BY id LIMIT ?",
+                                   conn, params=[row[0] if row else 0, MAX_COMMIT_ROWS])
+            if df.empty:
+                conn.execute("COMMIT")
+                return count
+            path, rows = _next_run(table, df)
+            last_id = int(rows['id'].max())
+            file_columns = _header(path)
+            other = rows['store_id'] != rollups.DEFAULT_STORE
+            if 'store_id' not in file_columns and other.any():
+                # Stored before validation checked the data file; they have nowhere to go
+                logger.warning("Skipping %d %s rows of other stores: %s has no store_id column",
+                               int(other.sum()), table, path)
+                rows = rows[~other]
+            if not rows.empty:
+                _append(path, rows, file_columns)
+            conn.execute("INSERT OR REPLACE INTO exported VALUES (?, ?)", [table, last_id])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        count += len(rows)
+
+
+def export(conn):
+    """Append rows committed to the store but not yet to the data files, and return how many.
+
+    Each table is exported on its own, so a table that fails to export
+    does not hold back the other.
+    """
+    _check_storage()
+    count = 0
+    for table in COLUMNS:
+        try:
+            count += _export_table(conn, table)
+        except Exception:
+            # Its committed rows stay in the store and go out with the next export
+            logger.exception("Exporting ingested %s rows to the data files failed", table)
+    return count
+
+
+class BatchWriter:
+    """Commits submitted batches from a single thread, grouping waiting batches into one transaction."""
+
+    def __init__(self, path=None):
+        self._conn = connect(path)
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name='ingest-writer', daemon=True)
+        self._thread.start()
+
+    def submit(self, table, df, batch_id=None):
+        """Store a validated batch; returns once it is committed, with the number of rows stored."""
+        done = threading.Event()
+        request = {'table': table, 'df': df, 'batch_id': batch_id, 'done': done, 'stored': 0, 'error': None}
+        self._queue.put(request)
+        done.wait()
+        if request['error'] is not None:
+            raise request['error']
+        return request['stored']
+
+    def flush(self):
+        """Wait until every batch submitted so far is committed and exported."""
+        self.submit(None, None)
+
+    def _take(self):
+        requests = [self._queue.get()]
+        rows = 0
+        while True:
+            if requests[-1]['df'] is not None:
+                rows += len(requests[-1]['df'])
+            if rows >= MAX_COMMIT_ROWS:
+                break
+            try:
+                requests.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return requests
+
+    def _commit(self, requests):
+        conn = self._conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for request in requests:
+                if request['df'] is None:
+                    continue
+                batch_id = request['batch_id']
+                if batch_id is not None:
+                    inserted = conn.execute("INSERT OR IGNORE INTO batches VALUES (?)", [batch_id]).rowcount
+                    if not inserted:
+                        continue
+                columns = list(COLUMNS[request['table']])
+                conn.executemany(
+                    f"INSERT INTO {request['table']} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                    request['df'][columns].astype(object).itertuples(index=False, name=None),
+                )
+                request['stored'] = len(request['df'])
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _run(self):
+        while True:
+            requests = self._take()
+            try:
+                self._commit(requests)
+            except Exception as error:
+                for request in requests:
+                    request['error'] = error
+            for request in requests:
+                request['done'].set()
+            try:
+                export(self._conn)
+            except Exception:
+                logger.exception("Exporting ingested rows to the data files failed")
+
+
+def get_writer():
+    """Return the process-wide batch writer, starting it on first use."""
+    global _writer
+    if _writer is None:
+        with _lock:
+            if _writer is None:
+                _writer = BatchWriter()
+    return _writer
+
+
+def ingest(table, rows, batch_id=None):
+    """Validate and durably store a batch of rows; returns the number of rows stored."""
+    if table not in COLUMNS:
+        raise ValueError(f"Unknown table: {table}")
+    df = validate(table, rows)
+    return get_writer().submit(table, df, batch_id)
+
+
+def register(server):
+    """Add the /ingest/<table> route to the Flask server when ingest is enabled."""
+    if not ENABLED:
+        return
+    _check_storage()
+    from flask import abort, jsonify, request
+
+    @server.route('/ingest/<table>', methods=['POST'])
+    def ingest_batch(table):
+        if TOKEN and request.headers.get('Authorization') != f'Bearer {TOKEN}':
+            abort(401)
+        if table not in COLUMNS:
+            abort(404)
+        body = request.get_json(silent=True)
+        if isinstance(body, list):
+            body = {'rows': body}
+        if not isinstance(body, dict) or not isinstance(body.get('rows'), list) or not body['rows']:
+            return jsonify(error="expected a JSON object with a non-empty 'rows' list"), 400
+        try:
+            stored = ingest(table, body['rows'], body.get('batch_id'))
+        except ValidationError as error:
+            return jsonify(errors=[{'row': row, 'error': message} for row, message in error.errors]), 400
+        return jsonify(stored=stored, duplicate=stored == 0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest order lines or expenses into the dashboard data.")
+    parser.add_argument('table', choices=sorted(COLUMNS))
+    parser.add_argument('file', help="CSV or JSON (list of rows) file")
+    parser.add_argument('--batch-rows', type=int, default=10_000, help="Rows per batch (default: 10000)")
+    parser.add_argument('--batch-id', help="Idempotency key; batch n of the file is stored as <id>:<n>")
+    args = parser.parse_args()
+    try:
+        _check_storage()
+    except ValueError as error:
+        parser.error(str(error))
+    if args.file.endswith('.json'):
+        df = pd.read_json(args.file, dtype=False)
+        chunks = [df[i:i + args.batch_rows] for i in range(0, len(df), args.batch_rows)] or []
+    else:
+        chunks = pd.read_csv(args.file, dtype=str, chunksize=args.batch_rows)
+    stored = 0
+    for number, chunk in enumerate(chunks):
+        batch_id = f'{args.batch_id}:{number}' if args.batch_id else None
+        try:
+            stored += ingest(args.table, chunk, batch_id)
+        except ValidationError as error:
+            offset = number * args.batch_rows
+            for row, message in error.errors:
+                print(f"row {'-' if row is None else offset + row + 1}: {message}")
+            parser.exit(1, f"Batch {number} rejected; {stored} rows stored before it\n")
+    get_writer().flush()
+    print(f"Stored {stored} {args.table} rows")
+
+
+if __name__ == '__main__':
+    main()
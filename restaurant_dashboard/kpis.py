@@ -0,0 +1,141 @@
+"""KPI snapshot behind the Overview header cards.
+
+The snapshot holds total revenue, order lines, average order value, the
+best seller and their change over the last DASHBOARD_KPI_PERIOD_DAYS days
+against the period before. It is rebuilt from the incrementally maintained
+sales rollups only when the sales or menu files change, so rendering the
+cards costs a dictionary lookup.
+
+With DASHBOARD_KPI_REFRESH set to a number of seconds, a background thread
+checks the files on that interval and page renders never touch the disk.
+"""
+import logging
+import os
+import threading
+
+import pandas as pd
+
+import rollups
+
+# Length of the periods compared by the deltas
+PERIOD_DAYS = int(os.environ.get('DASHBOARD_KPI_PERIOD_DAYS', 7))
+
+# Background refresh interval in seconds; 0 checks the files on every render
+REFRESH_SECONDS = float(os.environ.get('DASHBOARD_KPI_REFRESH', 0))
+
+TABLES = ('sales', 'menu')
+
+logger = logging.getLogger(__name__)
+
+# Most snapshots kept, across data versions and stores
+MAX_SNAPSHOTS = 256
+
+# (data version, store) -> snapshot
+_snapshots = {}
+# Store -> most recent snapshot
+_latest = {}
+_lock = threading.Lock()
+_thread = None
+
+
+def _change(current, previous):
+    """Relative change between two periods, or None without a previous value."""
+    if not previous:
+        return None
+    return (current - previous) / previous
+
+
+def _period_totals(daily, first, last):
+    period = daily[(daily['date'] > first) & (daily['date'] <= last)]
+    revenue = period['total_price'].sum()
+    orders = int(period['lines'].sum())
+    return revenue, orders, revenue / orders if orders > 0 else 0
+
+
+def compute(version=None, store=None):
+    """Build a snapshot of one store, or of the whole chain, from the sales rollups."""
+    totals = rollups.sales_totals(store=store)
+    daily = rollups.daily_sales(store=store)
+    daily = daily.assign(date=pd.to_datetime(daily['date']))
+
+    revenue, orders = totals['total_revenue'], totals['total_orders']
+    snapshot = {
+        'version': version,
+        'store': store,
+        'total_revenue': revenue,
+        'total_orders': orders,
+        'avg_order_value': revenue / orders if orders > 0 else 0,
+        'top_dish_name': totals['top_dish_name'],
+        'period_days': PERIOD_DAYS,
+        'revenue_delta': None,
+        'orders_delta': None,
+        'aov_delta': None,
+    }
+    if len(daily):
+        last = daily['date'].max()
+        period = pd.Timedelta(days=PERIOD_DAYS)
+        current = _period_totals(daily, last - period, last)
+        previous = _period_totals(daily, last - 2 * period, last - period)
+        snapshot['revenue_delta'], snapshot['orders_delta'], snapshot['aov_delta'] = (
+            _change(c, p) for c, p in zip(current, previous)
+        )
+    return snapshot
+
+
+def refresh(store=None):
+    """Rebuild a store's snapshot if the sales or menu files changed, and return it."""
+    version = tuple(rollups.table_version(table) for table in TABLES)
+    key = (version, store)
+    snapshot = _snapshots.get(key)
+    if snapshot is not None:
+        return snapshot
+    with _lock:
+        snapshot = _snapshots.get(key)
+        if snapshot is None:
+            # Swap in a complete snapshot so readers never see a partial one
+            snapshot = compute(version, store)
+            _snapshots[key] = snapshot
+            while len(_snapshots) > MAX_SNAPSHOTS:
+                _snapshots.pop(next(iter(_snapshots)))
+            _latest[store] = snapshot
+    return snapshot
+
+
+def snapshot(store=None):
+    """Return the current KPI snapshot of a store, or of the whole chain.
+
+    In background mode this never waits on the data files once the store has
+    a snapshot.
+    """
+    if _thread is not None and store in _latest:
+        return _latest[store]
+    return refresh(store)
+
+
+def clear():
+    """Drop every snapshot; the next render rebuilds it from the rollups."""
+    with _lock:
+        _snapshots.clear()
+        _latest.clear()
+
+
+def _refresh_loop(interval, stop):
+    while not stop.wait(interval):
+        try:
+            for store in list(_latest):
+                refresh(store)
+        except Exception:
+            # Keep serving the last good snapshot; the next tick retries
+            logger.exception("KPI snapshot refresh failed")
+
+
+def start_background_refresh(interval=REFRESH_SECONDS):
+    """Refresh the snapshot on a daemon thread every interval seconds."""
+    global _thread
+    if interval <= 0 or _thread is not None:
+        return None
+    refresh()
+    stop = threading.Event()
+    _thread = threading.Thread(target=_refresh_loop, args=(interval, stop), name='kpi-refresh', daemon=True)
+    _thread.start()
+    return stop
@@ -0,0 +1,231 @@
+"""Opt-in timing of page callbacks and page layouts.
+
+Set DASHBOARD_METRICS=1 to record, for every page callback and layout, the
+time spent in each stage, the rows read and produced, and the size of the
+JSON payload. Metrics are served per process at /metrics in Prometheus text
+format:
+
+    load       reading and parsing data files
+    transform  building rollups from the loaded rows
+    figure     building Plotly figures (or the component tree, for layouts)
+    serialize  encoding the result as JSON
+
+Stage times are exclusive, so a file read inside a rollup counts as load
+only. /profile/<target> (e.g. /profile/callback:financials?start=2024-01-01&store=3)
+runs one target under pyinstrument, when installed, or cProfile and returns
+the report.
+"""
+import cProfile
+import functools
+import io
+import os
+import pstats
+import threading
+import time
+from collections import defaultdict
+from contextlib import nullcontext
+
+import plotly.io as pio
+
+ENABLED = os.environ.get('DASHBOARD_METRICS', '0').lower() not in ('', '0', 'false')
+
+# Upper bounds (seconds) of the call duration histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+STAGES = ('load', 'transform', 'figure', 'layout', 'serialize')
+
+_NULL = nullcontext()
+_local = threading.local()
+_lock = threading.Lock()
+
+# target -> {'calls', 'seconds', 'buckets', 'bytes'}
+_calls = {}
+# (target, stage) -> seconds
+_stage_seconds = defaultdict(float)
+# (target, stage) -> rows
+_rows = defaultdict(int)
+
+
+class _Stage:
+    def __init__(self, record, name):
+        self.record = record
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        self.record['stack'].append(0.0)
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.started
+        stack = self.record['stack']
+        self.record['stages'][self.name] += elapsed - stack.pop()
+        if stack:
+            stack[-1] += elapsed
+
+
+def stage(name):
+    """Time a block as one stage of the callback running on this thread."""
+    record = getattr(_local, 'record', None)
+    if record is None:
+        return _NULL
+    return _Stage(record, name)
+
+
+def add_rows(stage_name, rows):
+    """Count rows read or produced by a stage of the running callback."""
+    record = getattr(_local, 'record', None)
+    if record is not None:
+        record['rows'][stage_name] += rows
+
+
+def _observe(target, record, seconds, size):
+    with _lock:
+        entry = _calls.setdefault(target, {'calls': 0, 'seconds': 0.0, 'buckets': [0] * len(BUCKETS), 'bytes': 0})
+        entry['calls'] += 1
+        entry['seconds'] += seconds
+        entry['bytes'] += size
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                entry['buckets'][i] += 1
+        for name, value in record['stages'].items():
+            _stage_seconds[target, name] += value
+        for name, value in record['rows'].items():
+            _rows[target, name] += value
+
+
+def instrument(target, func, outer_stage='figure'):
+    """Record stage timings, rows and payload size for every call of func.
+
+    Whatever func does outside the nested load/transform stages is counted as
+    outer_stage. The payload is measured by serializing the result the way
+    Dash does, so enabling metrics adds one extra serialization per call.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        if not ENABLED or getattr(_local, 'record', None) is not None:
+            return func(*args, **kwargs)
+        record = {'stages': defaultdict(float), 'rows': defaultdict(int), 'stack': []}
+        _local.record = record
+        started = time.perf_counter()
+        try:
+            with stage(outer_stage):
+                result = func(*args, **kwargs)
+            with stage('serialize'):
+                size = len(pio.json.to_json_plotly(result))
+        finally:
+            _local.record = None
+        _observe(target, record, time.perf_counter() - started, size)
+        return result
+    return wrapper
+
+
+def instrument_pages(page_registry):
+    """Wrap the layout function of every registered page."""
+    for page in page_registry.values():
+        if callable(page['layout']):
+            page_id = page['module'].split('.')[-1]
+            page['layout'] = instrument(f'layout:{page_id}', page['layout'], 'layout')
+
+
+def render():
+    """Render the collected metrics in Prometheus text format."""
+    lines = []
+
+    def family(name, kind, help_text):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+
+    with _lock:
+        calls = {target: dict(entry, buckets=list(entry['buckets'])) for target, entry in _calls.items()}
+        stage_seconds = dict(_stage_seconds)
+        rows = dict(_rows)
+
+    family('dashboard_call_duration_seconds', 'histogram', 'Duration of page callback and layout calls.')
+    for target, entry in sorted(calls.items()):
+        for bound, count in zip(BUCKETS, entry['buckets']):
+            lines.append(f'dashboard_call_duration_seconds_bucket{{target="{target}",le="{bound}"}} {count}')
+        lines.append(f'dashboard_call_duration_seconds_bucket{{target="{target}",le="+Inf"}} {entry["calls"]}')
+        lines.append(f'dashboard_call_duration_seconds_sum{{target="{target}"}} {entry["seconds"]}')
+        lines.append(f'dashboard_call_duration_seconds_count{{target="{target}"}} {entry["calls"]}')
+
+    family('dashboard_stage_seconds_total', 'counter', 'Time spent per stage of page callbacks and layouts.')
+    for (target, name), value in sorted(stage_seconds.items()):
+        lines.append(f'dashboard_stage_seconds_total{{target="{target}",stage="{name}"}} {value}')
+
+    family('dashboard_rows_total', 'counter', 'Rows read (load) and produced (transform) per target.')
+    for (target, name), value in sorted(rows.items()):
+        lines.append(f'dashboard_rows_total{{target="{target}",stage="{name}"}} {value}')
+
+    family('dashboard_payload_bytes_total', 'counter', 'Serialized JSON bytes returned per target.')
+    for target, entry in sorted(calls.items()):
+        lines.append(f'dashboard_payload_bytes_total{{target="{target}"}} {entry["bytes"]}')
+    return '\n'.join(lines) + '\n'
+
+
+def _resolve(target, date_range, store=None):
+    """Return a no-argument call running a target without the figure cache."""
+    import dash
+    import routing
+
+    kind, _, page_id = target.partition(':')
+    if kind == 'callback' and page_id in routing.page_callbacks:
+        func = routing.page_callbacks[page_id]
+        func = getattr(func, '__wrapped__', func)
+        return lambda: func(None, date_range, store)
+    if kind == 'layout':
+        for page in dash.page_registry.values():
+            if page['module'].split('.')[-1] == page_id:
+                return getattr(page['layout'], '__wrapped__', page['layout'])
+    return None
+
+
+def profile(call, profiler=None):
+    """Run call once under a profiler and return the text report."""
+    if profiler in (None, 'pyinstrument'):
+        try:
+            from pyinstrument import Profiler
+        except ImportError:
+            if profiler == 'pyinstrument':
+                raise
+        else:
+            sampler = Profiler()
+            sampler.start()
+            try:
+                call()
+            finally:
+                sampler.stop()
+            return sampler.output_text()
+    tracer = cProfile.Profile()
+    tracer.runcall(call)
+    out = io.StringIO()
+    pstats.Stats(tracer, stream=out).sort_stats('cumulative').print_stats(50)
+    return out.getvalue()
+
+
+def register(server):
+    """Add the /metrics and /profile routes to the Flask server when metrics are enabled."""
+    if not ENABLED:
+        return
+    from flask import Response, abort, request
+
+    @server.route('/metrics')
+    def prometheus_metrics():
+        return Response(render(), mimetype='text/plain; version=0.0.4')
+
+    @server.route('/profile/<target>')
+    def profile_target(target):
+        date_range = {'start': request.args.get('start'), 'end': request.args.get('end')}
+        store = request.args.get('store', type=int)
+        call = _resolve(target, date_range, store)
+        if call is None:
+            abort(404)
+        if request.args.get('cold'):
+            import data_store
+            import rollups
+            rollups.clear()
+            data_store.clear()
+        try:
+            report = profile(call, request.args.get('profiler'))
+        except ImportError:
+            abort(400)
+        return Response(report, mimetype='text/plain')
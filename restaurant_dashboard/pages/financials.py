@@ -1,22 +1,20 @@
 import dash
-from dash import html, dcc, callback, Input, Output
+from dash import html, dcc, Output
 import dash_bootstrap_components as dbc
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import os
 
-dash.register_page(__name__, path='/financials', title='Financials')
+import charts
+import figures
+from figure_cache import cached_figure
+from routing import page_callback, page_root_id, progress_bar
+from utils import date_bounds
 
-def get_data_path(filename):
-    """Get absolute path to data file."""
-    current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    return os.path.join(current_dir, 'data', filename)
+dash.register_page(__name__, path='/financials', title='Financials')
 
 def layout():
     return html.Div([
         html.H1("Financial Analysis", style={"font-weight": "bold", "font-family": "Georgia, serif", "color": "#000000"}),
         html.Hr(),
+        progress_bar('financials'),
         
         dbc.Row([
             dbc.Col([
@@ -41,67 +39,24 @@ def layout():
                 ], className="p-3 border rounded bg-light")
             ], width=6),
         ])
-    ])
+    ], id=page_root_id('financials'))
 
-@callback(
-    Output('revenue-expenses-graph', 'figure'),
-    Input('url', 'pathname')
-)
-def update_rev_exp_graph(_):
-    sales_df = pd.read_csv(get_data_path('sales.csv'))
-    expenses_df = pd.read_csv(get_data_path('expenses.csv'))
-    
-    daily_rev = sales_df.groupby('date')['total_price'].sum().reset_index()
-    daily_exp = expenses_df.groupby('date')['amount'].sum().reset_index()
-    
-    fig = go.Figure()
-    fig.add_trace(go.Scatter(x=daily_rev['date'], y=daily_rev['total_price'], name='Revenue',
-                             line=dict(color='#FFD700', width=4)))
-    fig.add_trace(go.Scatter(x=daily_exp['date'], y=daily_exp['amount'], name='Expenses',
-                             line=dict(color='#000000', width=2, dash='dash')))
-    
-    fig.update_layout(
-        plot_bgcolor='white',
-        paper_bgcolor='white',
-        font_family="Georgia, serif",
-        xaxis_title="Date",
-        yaxis_title="Amount ($)"
-    )
-    return fig
+# The revenue/expense and profit charts share the same daily aggregate, bucketed alike
+charts.register('revenue-expenses-graph', measures=['total_price', 'amount'], dimensions=['date'],
+                visual='lines', names=['Revenue', 'Expenses'], colors=[figures.GOLD, figures.BLACK],
+                widths=[4, 2], dashes=[None, 'dash'], y_title="Amount ($)")
+charts.register('expense-pie-graph', measures=['amount'], dimensions=['category'], visual='pie')
+charts.register('profit-trend-graph', measures=['profit'], dimensions=['date'], visual='area',
+                color=figures.GOLD, y_title="Net Profit ($)")
 
-@callback(
+@page_callback(
+    'financials',
+    Output('revenue-expenses-graph', 'figure'),
     Output('expense-pie-graph', 'figure'),
-    Input('url', 'pathname')
-)
-def update_expense_pie(_):
-    expenses_df = pd.read_csv(get_data_path('expenses.csv'))
-    cat_exp = expenses_df.groupby('category')['amount'].sum().reset_index()
-    
-    fig = px.pie(cat_exp, values='amount', names='category',
-                 color_discrete_sequence=['#000000', '#FFD700', '#808080', '#C0C0C0', '#E0E0E0'])
-    fig.update_layout(font_family="Georgia, serif")
-    return fig
-
-@callback(
     Output('profit-trend-graph', 'figure'),
-    Input('url', 'pathname')
+    background=True,
 )
-def update_profit_trend(_):
-    sales_df = pd.read_csv(get_data_path('sales.csv'))
-    expenses_df = pd.read_csv(get_data_path('expenses.csv'))
-    
-    daily_rev = sales_df.groupby('date')['total_price'].sum().reset_index()
-    daily_exp = expenses_df.groupby('date')['amount'].sum().reset_index()
-    
-    merged = daily_rev.merge(daily_exp, on='date', how='outer').fillna(0)
-    merged['profit'] = merged['total_price'] - merged['amount']
-    
-    fig = px.area(merged, x='date', y='profit', color_discrete_sequence=['#FFD700'])
-    fig.update_layout(
-        plot_bgcolor='white',
-        paper_bgcolor='white',
-        font_family="Georgia, serif",
-        xaxis_title="Date",
-        yaxis_title="Net Profit ($)"
-    )
-    return fig
+@cached_figure
+def update_financials_page(_, date_range, store):
+    start, end = date_bounds(date_range)
+    return charts.render(['revenue-expenses-graph', 'expense-pie-graph', 'profit-trend-graph'], start, end, store)
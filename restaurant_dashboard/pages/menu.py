@@ -1,21 +1,20 @@
 import dash
-from dash import html, dcc, callback, Input, Output
+from dash import html, dcc, Output
 import dash_bootstrap_components as dbc
-import pandas as pd
-import plotly.express as px
-import os
 
-dash.register_page(__name__, path='/menu', title='Menu Performance')
+import charts
+import figures
+from figure_cache import cached_figure
+from routing import page_callback, page_root_id, progress_bar
+from utils import date_bounds
 
-def get_data_path(filename):
-    """Get absolute path to data file."""
-    current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    return os.path.join(current_dir, 'data', filename)
+dash.register_page(__name__, path='/menu', title='Menu Performance')
 
 def layout():
     return html.Div([
         html.H1("Menu Performance", style={"font-weight": "bold", "font-family": "Georgia, serif", "color": "#000000"}),
         html.Hr(),
+        progress_bar('menu'),
         
         dbc.Row([
             dbc.Col([
@@ -34,47 +33,24 @@ def layout():
                 ], className="p-3 border rounded bg-light")
             ], width=12),
         ])
-    ])
+    ], id=page_root_id('menu'))
 
-@callback(
-    Output('menu-scatter-graph', 'figure'),
-    Input('url', 'pathname')
-)
-def update_menu_scatter(_):
-    sales_df = pd.read_csv(get_data_path('sales.csv'))
-    menu_df = pd.read_csv(get_data_path('menu.csv'))
-    
-    dish_stats = sales_df.groupby('dish_id').agg({
-        'quantity': 'sum',
-        'total_price': 'sum'
-    }).reset_index()
-    
-    df = dish_stats.merge(menu_df, on='dish_id')
-    
-    fig = px.scatter(df, x='quantity', y='total_price', size='price', color='category',
-                     hover_name='dish_name', text='dish_name',
-                     color_discrete_sequence=['#000000', '#FFD700', '#808080'])
-    
-    fig.update_traces(textposition='top center')
-    fig.update_layout(
-        plot_bgcolor='white',
-        paper_bgcolor='white',
-        font_family="Georgia, serif",
-        xaxis_title="Quantity Sold",
-        yaxis_title="Total Revenue ($)"
-    )
-    return fig
+# Both charts share one per-dish aggregate
+DISH_DIMENSIONS = ['dish_id', 'dish_name', 'category', 'price']
+charts.register('menu-scatter-graph', measures=['quantity', 'total_price'], dimensions=DISH_DIMENSIONS,
+                visual='bubbles', size='price', group='category', text='dish_name',
+                x_title="Quantity Sold", y_title="Total Revenue ($)")
+charts.register('menu-category-sunburst', measures=['quantity'], dimensions=DISH_DIMENSIONS,
+                visual='sunburst', parent='category', label='dish_name',
+                colors=[figures.GOLD, figures.BLACK, '#FFFFFF'])
 
-@callback(
+@page_callback(
+    'menu',
+    Output('menu-scatter-graph', 'figure'),
     Output('menu-category-sunburst', 'figure'),
-    Input('url', 'pathname')
+    background=True,
 )
-def update_menu_sunburst(_):
-    sales_df = pd.read_csv(get_data_path('sales.csv'))
-    menu_df = pd.read_csv(get_data_path('menu.csv'))
-    df = sales_df.merge(menu_df, on='dish_id')
-    
-    fig = px.sunburst(df, path=['category', 'dish_name'], values='quantity',
-                      color_discrete_sequence=['#FFD700', '#000000', '#FFFFFF'])
-    fig.update_layout(font_family="Georgia, serif")
-    return fig
+@cached_figure
+def update_menu_page(_, date_range, store):
+    start, end = date_bounds(date_range)
+    return charts.render(['menu-scatter-graph', 'menu-category-sunburst'], start, end, store)
@@ -1,64 +1,74 @@
 import dash
-from dash import html, dcc, callback, Input, Output
+from dash import html, dcc, callback, ctx, Input, Output
+from dash.exceptions import PreventUpdate
 import dash_bootstrap_components as dbc
-import pandas as pd
-import plotly.express as px
-import plotly.graph_objects as go
-import os
+
+import charts
+import figures
+import kpis
+from figure_cache import cached_figure
+from routing import page_callback, page_root_id
+from utils import date_bounds
 
 dash.register_page(__name__, path='/', title='Overview')
 
-def get_data_path(filename):
-    """Get absolute path to data file."""
-    current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    return os.path.join(current_dir, 'data', filename)
+def delta_text(delta, period_days):
+    """Change against the previous period, shown under a KPI value."""
+    if delta is None:
+        return None
+    color = "#2e7d32" if delta >= 0 else "#c62828"
+    return html.Small(f"{delta:+.1%} vs previous {period_days} days", style={"color": color})
 
-def layout():
-    # Load data
-    sales_df = pd.read_csv(get_data_path('sales.csv'))
-    menu_df = pd.read_csv(get_data_path('menu.csv'))
-    
-    total_revenue = sales_df['total_price'].sum()
-    total_orders = len(sales_df)
-    avg_order_value = total_revenue / total_orders if total_orders > 0 else 0
+def kpi_cards(kpi):
+    """The KPI cards for a snapshot."""
+    total_revenue = kpi['total_revenue']
+    total_orders = kpi['total_orders']
+    avg_order_value = kpi['avg_order_value']
     
     # Top Dish
-    top_dish_id = sales_df.groupby('dish_id')['quantity'].sum().idxmax()
-    top_dish_name = menu_df[menu_df['dish_id'] == top_dish_id]['dish_name'].values[0]
+    top_dish_name = kpi['top_dish_name']
+    period_days = kpi['period_days']
+
+    return [
+        dbc.Col(dbc.Card([
+            dbc.CardBody([
+                html.H5("Total Revenue", className="card-title", style={"color": "#000000"}),
+                html.H2(f"${total_revenue:,.2f}", style={"color": "#FFD700", "font-weight": "bold"}),
+                delta_text(kpi['revenue_delta'], period_days),
+            ])
+        ], style={"border-left": "5px solid #FFD700"}), width=3),
+        
+        dbc.Col(dbc.Card([
+            dbc.CardBody([
+                html.H5("Total Orders", className="card-title"),
+                html.H2(f"{total_orders:,}", style={"color": "#000000", "font-weight": "bold"}),
+                delta_text(kpi['orders_delta'], period_days),
+            ])
+        ], style={"border-left": "5px solid #000000"}), width=3),
+        
+        dbc.Col(dbc.Card([
+            dbc.CardBody([
+                html.H5("Avg Order Value", className="card-title"),
+                html.H2(f"${avg_order_value:.2f}", style={"color": "#000000", "font-weight": "bold"}),
+                delta_text(kpi['aov_delta'], period_days),
+            ])
+        ], style={"border-left": "5px solid #000000"}), width=3),
+        
+        dbc.Col(dbc.Card([
+            dbc.CardBody([
+                html.H5("Best Seller", className="card-title"),
+                html.H2(top_dish_name, style={"color": "#FFD700", "font-weight": "bold", "font-size": "1.5rem"})
+            ])
+        ], style={"border-left": "5px solid #FFD700"}), width=3),
+    ]
 
+def layout():
     return html.Div([
         html.H1("Business Overview", style={"font-weight": "bold", "font-family": "Georgia, serif", "color": "#000000"}),
         html.Hr(),
         
-        dbc.Row([
-            dbc.Col(dbc.Card([
-                dbc.CardBody([
-                    html.H5("Total Revenue", className="card-title", style={"color": "#000000"}),
-                    html.H2(f"${total_revenue:,.2f}", style={"color": "#FFD700", "font-weight": "bold"})
-                ])
-            ], style={"border-left": "5px solid #FFD700"}), width=3),
-            
-            dbc.Col(dbc.Card([
-                dbc.CardBody([
-                    html.H5("Total Orders", className="card-title"),
-                    html.H2(f"{total_orders:,}", style={"color": "#000000", "font-weight": "bold"})
-                ])
-            ], style={"border-left": "5px solid #000000"}), width=3),
-            
-            dbc.Col(dbc.Card([
-                dbc.CardBody([
-                    html.H5("Avg Order Value", className="card-title"),
-                    html.H2(f"${avg_order_value:.2f}", style={"color": "#000000", "font-weight": "bold"})
-                ])
-            ], style={"border-left": "5px solid #000000"}), width=3),
-            
-            dbc.Col(dbc.Card([
-                dbc.CardBody([
-                    html.H5("Best Seller", className="card-title"),
-                    html.H2(top_dish_name, style={"color": "#FFD700", "font-weight": "bold", "font-size": "1.5rem"})
-                ])
-            ], style={"border-left": "5px solid #FFD700"}), width=3),
-        ], className="mb-4"),
+        # Precomputed, so rendering the cards never waits on the data files
+        dbc.Row(kpi_cards(kpis.snapshot()), id='kpi-cards', className="mb-4"),
         
         dbc.Row([
             dbc.Col([
@@ -74,36 +84,29 @@ def layout():
                 ], className="p-3 border rounded bg-light")
             ], width=4),
         ])
-    ])
+    ], id=page_root_id('overview'))
+
+charts.register('revenue-trend-graph', measures=['total_price'], dimensions=['date'], visual='line',
+                color=figures.GOLD, y_title="Revenue ($)")
+charts.register('category-pie-graph', measures=['total_price'], dimensions=['category'], visual='pie')
 
 @callback(
-    Output('revenue-trend-graph', 'figure'),
-    Input('url', 'pathname')
+    Output('kpi-cards', 'children'),
+    Input(page_root_id('overview'), 'id'),
+    Input('store', 'data'),
 )
-def update_revenue_graph(_):
-    sales_df = pd.read_csv(get_data_path('sales.csv'))
-    daily_sales = sales_df.groupby('date')['total_price'].sum().reset_index()
-    fig = px.line(daily_sales, x='date', y='total_price', 
-                  color_discrete_sequence=['#FFD700'])
-    fig.update_layout(
-        plot_bgcolor='white',
-        paper_bgcolor='white',
-        font_family="Georgia, serif",
-        xaxis_title="Date",
-        yaxis_title="Revenue ($)"
-    )
-    return fig
+def update_kpi_cards(_, store):
+    # The layout already rendered the chain-wide cards
+    if store is None and ctx.triggered_id == page_root_id('overview'):
+        raise PreventUpdate
+    return kpi_cards(kpis.snapshot(store))
 
-@callback(
+@page_callback(
+    'overview',
+    Output('revenue-trend-graph', 'figure'),
     Output('category-pie-graph', 'figure'),
-    Input('url', 'pathname')
 )
-def update_category_graph(_):
-    sales_df = pd.read_csv(get_data_path('sales.csv'))
-    menu_df = pd.read_csv(get_data_path('menu.csv'))
-    df = sales_df.merge(menu_df, on='dish_id')
-    cat_sales = df.groupby('category')['total_price'].sum().reset_index()
-    fig = px.pie(cat_sales, values='total_price', names='category',
-                 color_discrete_sequence=['#000000', '#FFD700', '#808080'])
-    fig.update_layout(font_family="Georgia, serif")
-    return fig
+@cached_figure
+def update_overview_page(_, date_range, store):
+    start, end = date_bounds(date_range)
+    return charts.render(['revenue-trend-graph', 'category-pie-graph'], start, end, store)
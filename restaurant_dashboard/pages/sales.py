@@ -1,16 +1,14 @@
 import dash
-from dash import html, dcc, callback, Input, Output
+from dash import html, dcc, Output
 import dash_bootstrap_components as dbc
-import pandas as pd
-import plotly.express as px
-import os
 
-dash.register_page(__name__, path='/sales', title='Sales Analysis')
+import charts
+import figures
+from figure_cache import cached_figure
+from routing import page_callback, page_root_id
+from utils import date_bounds
 
-def get_data_path(filename):
-    """Get absolute path to data file."""
-    current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    return os.path.join(current_dir, 'data', filename)
+dash.register_page(__name__, path='/sales', title='Sales Analysis')
 
 def layout():
     return html.Div([
@@ -40,68 +38,22 @@ def layout():
                 ], className="p-3 border rounded bg-light")
             ], width=6),
         ])
-    ])
+    ], id=page_root_id('sales'))
 
-@callback(
-    Output('sales-volume-graph', 'figure'),
-    Input('url', 'pathname')
-)
-def update_sales_volume_graph(_):
-    sales_df = pd.read_csv(get_data_path('sales.csv'))
-    daily_orders = sales_df.groupby('date')['quantity'].sum().reset_index()
-    fig = px.bar(daily_orders, x='date', y='quantity', 
-                 color_discrete_sequence=['#000000'])
-    fig.update_layout(
-        plot_bgcolor='white',
-        paper_bgcolor='white',
-        font_family="Georgia, serif",
-        xaxis_title="Date",
-        yaxis_title="Total Items Sold"
-    )
-    return fig
+charts.register('sales-volume-graph', measures=['quantity'], dimensions=['date'], visual='bar',
+                color=figures.BLACK, y_title="Total Items Sold")
+charts.register('sales-quantity-bar', measures=['quantity'], dimensions=['dish_name'], visual='hbar',
+                top=10, color=figures.GOLD, x_title="Quantity Sold", y_title="Dish Name")
+charts.register('sales-revenue-bar', measures=['total_price'], dimensions=['dish_name'], visual='hbar',
+                top=10, color=figures.BLACK, x_title="Revenue ($)", y_title="Dish Name")
 
-@callback(
+@page_callback(
+    'sales',
+    Output('sales-volume-graph', 'figure'),
     Output('sales-quantity-bar', 'figure'),
-    Input('url', 'pathname')
-)
-def update_sales_quantity_bar(_):
-    sales_df = pd.read_csv(get_data_path('sales.csv'))
-    menu_df = pd.read_csv(get_data_path('menu.csv'))
-    df = sales_df.merge(menu_df, on='dish_id')
-    
-    dish_quantity = df.groupby('dish_name')['quantity'].sum().nlargest(10).reset_index()
-    
-    fig = px.bar(dish_quantity, x='quantity', y='dish_name', orientation='h',
-                 color_discrete_sequence=['#FFD700'])
-    fig.update_layout(
-        plot_bgcolor='white',
-        paper_bgcolor='white',
-        font_family="Georgia, serif",
-        xaxis_title="Quantity Sold",
-        yaxis_title="Dish Name",
-        yaxis={'categoryorder':'total ascending'}
-    )
-    return fig
-
-@callback(
     Output('sales-revenue-bar', 'figure'),
-    Input('url', 'pathname')
 )
-def update_sales_revenue_bar(_):
-    sales_df = pd.read_csv(get_data_path('sales.csv'))
-    menu_df = pd.read_csv(get_data_path('menu.csv'))
-    df = sales_df.merge(menu_df, on='dish_id')
-    
-    dish_revenue = df.groupby('dish_name')['total_price'].sum().nlargest(10).reset_index()
-    
-    fig = px.bar(dish_revenue, x='total_price', y='dish_name', orientation='h',
-                 color_discrete_sequence=['#000000'])
-    fig.update_layout(
-        plot_bgcolor='white',
-        paper_bgcolor='white',
-        font_family="Georgia, serif",
-        xaxis_title="Revenue ($)",
-        yaxis_title="Dish Name",
-        yaxis={'categoryorder':'total ascending'}
-    )
-    return fig
+@cached_figure
+def update_sales_page(_, date_range, store):
+    start, end = date_bounds(date_range)
+    return charts.render(['sales-volume-graph', 'sales-quantity-bar', 'sales-revenue-bar'], start, end, store)
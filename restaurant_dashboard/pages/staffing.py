@@ -2,7 +2,8 @@ import dash
 from dash import html, dcc
 import dash_bootstrap_components as dbc
 import pandas as pd
-import plotly.express as px
+
+import figures
 
 dash.register_page(__name__, path='/staffing', title='Staffing')
 
@@ -16,10 +17,13 @@ def layout():
     }
     df = pd.DataFrame(staff_data)
     
-    fig = px.bar(df, x='Name', y='Hours Worked', color='Role',
-                 color_discrete_sequence=['#000000', '#FFD700', '#808080'],
-                 title="Staff Hours This Month")
-    fig.update_layout(font_family="Georgia, serif", plot_bgcolor='white')
+    roles = df.groupby('Role', sort=False)
+    fig = figures.figure(
+        *(figures.bar(rows['Name'], rows['Hours Worked'], figures.PALETTE[i], name=role)
+          for i, (role, rows) in enumerate(roles)),
+        title="Staff Hours This Month",
+        legend_title_text="Role"
+    )
 
     return html.Div([
         html.H1("Staffing & Performance", style={"font-weight": "bold", "font-family": "Georgia, serif", "color": "#000000"}),
@@ -1,21 +1,20 @@
 import dash
-from dash import html, dcc, callback, Input, Output
+from dash import html, dcc, Output
 import dash_bootstrap_components as dbc
-import pandas as pd
-import plotly.express as px
-import os
 
-dash.register_page(__name__, path='/trends', title='Hourly Trends')
+import charts
+import figures
+from figure_cache import cached_figure
+from routing import page_callback, page_root_id, progress_bar
+from utils import date_bounds
 
-def get_data_path(filename):
-    """Get absolute path to data file."""
-    current_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    return os.path.join(current_dir, 'data', filename)
+dash.register_page(__name__, path='/trends', title='Hourly Trends')
 
 def layout():
     return html.Div([
         html.H1("Hourly Trends", style={"font-weight": "bold", "font-family": "Georgia, serif", "color": "#000000"}),
         html.Hr(),
+        progress_bar('trends'),
         
         dbc.Row([
             dbc.Col([
@@ -34,49 +33,22 @@ def layout():
                 ], className="p-3 border rounded bg-light")
             ], width=12),
         ])
-    ])
+    ], id=page_root_id('trends'))
 
-@callback(
-    Output('hourly-orders-graph', 'figure'),
-    Input('url', 'pathname')
-)
-def update_hourly_graph(_):
-    sales_df = pd.read_csv(get_data_path('sales.csv'))
-    hourly_sales = sales_df.groupby('hour')['quantity'].sum().reset_index()
-    
-    fig = px.bar(hourly_sales, x='hour', y='quantity', 
-                 color_discrete_sequence=['#FFD700'])
-    fig.update_layout(
-        plot_bgcolor='white',
-        paper_bgcolor='white',
-        font_family="Georgia, serif",
-        xaxis_title="Hour (24h format)",
-        yaxis_title="Total Items Sold",
-        xaxis=dict(tickmode='linear', tick0=11, dtick=1)
-    )
-    return fig
+charts.register('hourly-orders-graph', measures=['quantity'], dimensions=['hour'], visual='bar',
+                color=figures.GOLD, x_title="Hour (24h format)", y_title="Total Items Sold",
+                layout={'xaxis': dict(tickmode='linear', tick0=11, dtick=1)})
+charts.register('peak-hours-heatmap', measures=['quantity'], dimensions=['day_of_week', 'hour'],
+                visual='heatmap', rows=['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'],
+                z_title="Items Sold", x_title="Hour of Day", y_title="Day of Week")
 
-@callback(
+@page_callback(
+    'trends',
+    Output('hourly-orders-graph', 'figure'),
     Output('peak-hours-heatmap', 'figure'),
-    Input('url', 'pathname')
+    background=True,
 )
-def update_heatmap(_):
-    sales_df = pd.read_csv(get_data_path('sales.csv'))
-    sales_df['date'] = pd.to_datetime(sales_df['date'])
-    sales_df['day_of_week'] = sales_df['date'].dt.day_name()
-    
-    # Order days of week
-    days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    
-    heatmap_data = sales_df.groupby(['day_of_week', 'hour'])['quantity'].sum().reset_index()
-    
-    fig = px.density_heatmap(heatmap_data, x='hour', y='day_of_week', z='quantity',
-                             category_orders={'day_of_week': days},
-                             color_continuous_scale=['#FFFFFF', '#FFD700', '#000000'])
-    
-    fig.update_layout(
-        font_family="Georgia, serif",
-        xaxis_title="Hour of Day",
-        yaxis_title="Day of Week"
-    )
-    return fig
+@cached_figure
+def update_trends_page(_, date_range, store):
+    start, end = date_bounds(date_range)
+    return charts.render(['hourly-orders-graph', 'peak-hours-heatmap'], start, end, store)
@@ -0,0 +1,126 @@
+"""Date-partitioned sales storage.
+
+Split the sales table into one file per month (or per day) with:
+
+    python partitions.py --by month
+
+Once data/sales_partitions/ holds partitions, the dashboard reads them
+instead of the single sales table and opens only the partitions that
+overlap the requested date range. Partitions use the configured storage
+format, so CSV partitions can still be appended to by the POS.
+"""
+import argparse
+import os
+
+import pandas as pd
+
+import columnar
+import data_store
+import utils
+
+PARTITION_DIR = 'sales_partitions'
+
+# Partition granularity -> partition key format
+GRANULARITIES = {
+    'month': '%Y-%m',
+    'day': '%Y-%m-%d',
+}
+
+
+def partition_dir():
+    """Get the directory holding the sales partitions."""
+    return utils.get_data_path(PARTITION_DIR)
+
+
+def _extension():
+    if data_store.STORAGE_FORMAT == 'csv':
+        return '.csv'
+    return '.' + columnar.FORMATS[data_store.STORAGE_FORMAT]
+
+
+def list_partitions():
+    """Return (key, path) for every sales partition, sorted by key."""
+    directory = partition_dir()
+    if not os.path.isdir(directory):
+        return []
+    ext = _extension()
+    return sorted(
+        (filename[:-len(ext)], os.path.join(directory, filename))
+        for filename in os.listdir(directory)
+        if filename.endswith(ext)
+    )
+
+
+def partition_bounds(key):
+    """Return the first and last timestamp covered by a partition key."""
+    period = pd.Period(key, freq='M' if len(key) == 7 else 'D')
+    return period.start_time, period.end_time
+
+
+def sales_paths(start=None, end=None):
+    """Return the files holding the sales rows between start and end (inclusive).
+
+    Without partitions this is the single sales table.
+    """
+    partitions = list_partitions()
+    if not partitions:
+        return [data_store.table_path('sales')]
+    start = pd.Timestamp(start) if start is not None else None
+    end = pd.Timestamp(end) if end is not None else None
+    paths = []
+    for key, path in partitions:
+        first, last = partition_bounds(key)
+        if (end is None or first <= end) and (start is None or last >= start):
+            paths.append(path)
+    return paths
+
+
+def load_sales_range(start=None, end=None, columns=None):
+    """Load the sales rows between start and end, opening only the partitions needed."""
+    read_columns = columns
+    if columns is not None and 'date' not in columns:
+        read_columns = ['date'] + list(columns)
+    paths = sales_paths(start, end)
+    if not paths:
+        # The range touches no partition: no rows, with the partitions' columns and dtypes
+        df = data_store.get_file(list_partitions()[0][1], read_columns).iloc[:0]
+    else:
+        frames = [data_store.get_file(path, read_columns) for path in paths]
+        df = utils.filter_dates(pd.concat(frames, ignore_index=True), start, end)
+    return df if columns is None else df[list(columns)]
+
+
+def write_partitions(by='month'):
+    """Split the current sales table into date partitions and return their paths."""
+    key_format = GRANULARITIES[by]
+    sales_df = data_store.get_table('sales')
+    keys = pd.to_datetime(sales_df['date']).dt.strftime(key_format)
+
+    directory = partition_dir()
+    os.makedirs(directory, exist_ok=True)
+    ext = _extension()
+    for filename in os.listdir(directory):
+        if filename.endswith(ext):
+            os.remove(os.path.join(directory, filename))
+
+    paths = []
+    for key, partition in sales_df.groupby(keys):
+        path = os.path.join(directory, key + ext)
+        if ext == '.csv':
+            partition.to_csv(path, index=False)
+        else:
+            columnar.write_table(partition, 'sales', data_store.STORAGE_FORMAT, path)
+        paths.append(path)
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Split the sales table into date partitions.")
+    parser.add_argument('--by', choices=sorted(GRANULARITIES), default='month')
+    args = parser.parse_args()
+    paths = write_partitions(args.by)
+    print(f"Wrote {len(paths)} partitions to {partition_dir()}")
+
+
+if __name__ == '__main__':
+    main()
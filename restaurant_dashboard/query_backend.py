@@ -0,0 +1,438 @@
+"""Optional embedded SQL backend for the chart aggregates.
+
+With DASHBOARD_QUERY_BACKEND=sqlite or duckdb, the sales, expenses and menu
+tables are ingested into one database file (DASHBOARD_DB, by default
+data/dashboard.<backend>) indexed on date, dish_id and hour, and every
+chart aggregate runs as a GROUP BY query against it instead of over the
+pandas cubes. DuckDB runs each query on all cores; SQLite serves
+concurrent queries from separate pooled connections.
+
+When the data files change, rows appended to the CSVs since the last
+build are inserted in one transaction: in place for SQLite, whose readers
+keep seeing the previous rows until it commits, and into a copy that is
+then swapped in for DuckDB, which allows no writer while other processes
+read the file. A rewritten file, or columnar storage, rebuilds the
+database from scratch. With the background refresh scheduler running, this
+happens on its thread before the new data is published, not on the
+request path. Sales totals, daily sales, per-dish sales and the store list
+are queried from the database as well.
+Build the database ahead of time with:
+
+    python query_backend.py --backend duckdb
+"""
+import argparse
+import itertools
+import os
+import queue
+import shutil
+import threading
+from contextlib import contextmanager
+
+import pandas as pd
+
+import data_store
+import metrics
+import partitions
+import rollups
+import utils
+
+BACKENDS = ('sqlite', 'duckdb')
+
+# 'pandas' keeps aggregating the in-memory cubes
+BACKEND = os.environ.get('DASHBOARD_QUERY_BACKEND', 'pandas')
+ENABLED = BACKEND in BACKENDS
+
+# Connections open at once per process
+POOL_SIZE = int(os.environ.get('DASHBOARD_DB_CONNECTIONS', 4))
+
+# Table -> column -> SQL type
+SCHEMAS = {
+    'sales': {'date': 'TEXT', 'dish_id': 'INTEGER', 'hour': 'INTEGER', 'quantity': 'INTEGER',
+              'total_price': 'DOUBLE', 'store_id': 'INTEGER'},
+    'expenses': {'date': 'TEXT', 'category': 'TEXT', 'amount': 'DOUBLE', 'store_id': 'INTEGER'},
+    'menu': {'dish_id': 'INTEGER', 'dish_name': 'TEXT', 'category': 'TEXT', 'price': 'DOUBLE'},
+}
+
+INDEXES = {
+    'sales': [('date',), ('dish_id',), ('hour',), ('store_id', 'date')],
+    'expenses': [('date',), ('store_id', 'date')],
+    'menu': [('dish_id',)],
+}
+
+# Measure -> SQL aggregate; order lines are counted rather than stored
+AGGREGATES = {
+    'quantity': 'SUM(quantity)',
+    'total_price': 'SUM(total_price)',
+    'lines': 'COUNT(*)',
+    'amount': 'SUM(amount)',
+}
+
+MEASURE_DTYPES = {'quantity': 'int64', 'total_price': 'float64', 'lines': 'int64', 'amount': 'float64'}
+
+_pool = None
+_version = None
+_lock = threading.Lock()
+_links = itertools.count()
+
+
+def default_path(backend=BACKEND):
+    """Get the database file used by a backend."""
+    return os.environ.get('DASHBOARD_DB') or utils.get_data_path(f'dashboard.{backend}')
+
+
+def connect(path, backend=BACKEND, read_only=True):
+    """Open a connection to a database file."""
+    if backend == 'duckdb':
+        try:
+            import duckdb
+        except ImportError:
+            raise ImportError("The duckdb query backend needs the 'duckdb' package") from None
+        return duckdb.connect(path, read_only=read_only)
+    import sqlite3
+
+    if read_only:
+        return sqlite3.connect(f'file:{path}?mode=ro', uri=True, check_same_thread=False)
+    return sqlite3.connect(path)
+
+
+class PoolClosed(RuntimeError):
+    """The pool was retired and closed before a connection could be borrowed."""
+
+
+class ConnectionPool:
+    """Hands each thread a connection of its own, keeping at most size of them open.
+
+    DuckDB connections are cursors on one shared database instance, so
+    they share its buffer pool and worker threads. A retired pool stays
+    open until the last borrowed connection is returned.
+    """
+
+    def __init__(self, path, backend=BACKEND, size=POOL_SIZE):
+        self._path = path
+        self._backend = backend
+        self._root = self._open_root() if backend == 'duckdb' else None
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._state = threading.Lock()
+        self._borrowed = 0
+        self._retired = False
+        self._closed = False
+
+    def _open_root(self):
+        # DuckDB keeps one database instance per path in a process, and a retiring
+        # pool may still hold the file this one replaced; open it through its own link
+        link = f'{self._path}.{os.getpid()}.{next(_links)}.open'
+        os.link(self._path, link)
+        try:
+            return connect(link, self._backend)
+        finally:
+            os.remove(link)
+
+    def _open(self):
+        if self._root is not None:
+            return self._root.cursor()
+        return connect(self._path, self._backend)
+
+    @contextmanager
+    def connection(self):
+        """Borrow a connection, waiting for one when all are in use.
+
+        Raises PoolClosed if the pool has been closed.
+        """
+        with self._slots:
+            with self._state:
+                if self._closed:
+                    raise PoolClosed(self._path)
+                self._borrowed += 1
+            try:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    conn = self._open()
+                try:
+                    yield conn
+                finally:
+                    self._idle.put(conn)
+            finally:
+                with self._state:
+                    self._borrowed -= 1
+                    close = self._retired and not self._borrowed and not self._closed
+                    self._closed = self._closed or close
+                if close:
+                    self._close()
+
+    def retire(self):
+        """Close the pool as soon as no connection is borrowed; new borrows fail with PoolClosed."""
+        with self._state:
+            self._retired = True
+            close = not self._borrowed and not self._closed
+            self._closed = self._closed or close
+        if close:
+            self._close()
+
+    def _close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        if self._root is not None:
+            self._root.close()
+
+
+def _version_token():
+    return repr(data_store.dataset_version())
+
+
+def _files_token():
+    """The version of the data files as they are now, whatever version requests are being served."""
+    return repr(tuple(data_store.file_signature(path) for path in data_store.data_paths()))
+
+
+def _source_paths(table):
+    if table == 'sales':
+        return partitions.sales_paths()
+    return [data_store.table_path(table)]
+
+
+def _insert(conn, table, df, backend):
+    columns = list(SCHEMAS[table])
+    if 'store_id' in columns and rollups.STORE_COLUMN not in df:
+        df = df.assign(store_id=rollups.DEFAULT_STORE)
+    if 'date' in columns:
+        # Dates are stored as ISO text, the way the CSVs hold them
+        df = df.assign(date=pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d'))
+    if backend == 'duckdb':
+        conn.register('chunk', df[columns])
+        conn.execute(f"INSERT INTO {table} SELECT {', '.join(columns)} FROM chunk")
+        conn.unregister('chunk')
+    else:
+        placeholders = ', '.join('?' * len(columns))
+        conn.executemany(f"INSERT INTO {table} VALUES ({placeholders})",
+                         df[columns].itertuples(index=False, name=None))
+
+
+def _load(conn, table, path, backend, start=0):
+    """Insert a data file's rows, those past a byte offset for a CSV, and record how far it was read."""
+    schema = list(SCHEMAS[table])
+    signature = data_store.file_signature(path)
+    if path.endswith('.csv'):
+        with open(path, 'rb') as f:
+            header = f.readline()
+            start = max(start, len(header))
+            end = max(data_store.lines_end(f, signature[1]), start)
+            if end > start:
+                for chunk in data_store.iter_lines(f, start, end, header.decode().strip().split(','),
+                                                   set(schema).__contains__, rollups.DTYPES):
+                    _insert(conn, table, chunk, backend)
+            fingerprint = data_store.fingerprint(f, end)
+    else:
+        for chunk in data_store.iter_chunks(path, schema, rollups.DTYPES):
+            _insert(conn, table, chunk, backend)
+        end, fingerprint = 0, None
+    conn.execute("DELETE FROM sources WHERE path = ?", [path])
+    conn.execute("INSERT INTO sources VALUES (?, ?, ?, ?, ?, ?)",
+                 [path, table, repr(signature), signature[1], end, fingerprint])
+
+
+def _appended(path, size, offset, fingerprint):
+    """Whether a CSV only had lines appended since it was loaded."""
+    with open(path, 'rb') as f:
+        return data_store.is_append(f, size, offset, fingerprint)
+
+
+def _load_changes(conn, backend):
+    """Insert what the data files gained since the database was built, or return False if it must be rebuilt."""
+    try:
+        recorded = {row[0]: row[1:] for row in
+                    conn.execute("SELECT path, name, signature, size, read_to, fingerprint FROM sources").fetchall()}
+    except Exception:
+        # Built before sources were recorded
+        return False
+    current = {path: table for table in SCHEMAS for path in _source_paths(table)}
+    if not set(recorded) <= set(current):
+        return False
+    for path, table in current.items():
+        if path not in recorded:
+            # A new sales partition
+            _load(conn, table, path, backend)
+            continue
+        _, signature, size, offset, fingerprint = recorded[path]
+        if signature == repr(data_store.file_signature(path)):
+            continue
+        if table == 'menu':
+            conn.execute("DELETE FROM menu")
+            _load(conn, table, path, backend)
+        elif path.endswith('.csv') and _appended(path, size, offset, fingerprint):
+            _load(conn, table, path, backend, start=offset)
+        else:
+            return False
+    return True
+
+
+def ingest(path=None, backend=BACKEND):
+    """Build the database from the data files, chunk by chunk, and swap it in.
+
+    Returns the data version it was built from.
+    """
+    path = path or default_path(backend)
+    version = _version_token()
+    building = f'{path}.{os.getpid()}.tmp'
+    if os.path.exists(building):
+        os.remove(building)
+    conn = connect(building, backend, read_only=False)
+    try:
+        conn.execute("CREATE TABLE sources (path TEXT, name TEXT, signature TEXT, size BIGINT, read_to BIGINT, "
+                     "fingerprint TEXT)")
+        for table, schema in SCHEMAS.items():
+            columns = ', '.join(f'{column} {kind}' for column, kind in schema.items())
+            conn.execute(f"CREATE TABLE {table} ({columns})")
+            for source in _source_paths(table):
+                _load(conn, table, source, backend)
+            for columns in INDEXES[table]:
+                conn.execute(f"CREATE INDEX {table}_{'_'.join(columns)} ON {table} ({', '.join(columns)})")
+        conn.execute("CREATE TABLE meta (version TEXT)")
+        conn.execute("INSERT INTO meta VALUES (?)", [version])
+        conn.commit()
+    finally:
+        conn.close()
+    os.replace(building, path)
+    return version
+
+
+def update(path=None, backend=BACKEND):
+    """Bring the database up to date with the data files and return the data version it holds.
+
+    Rows appended to the CSVs since the last build are inserted in one
+    transaction, which also records the new version: in place for SQLite,
+    into a copy that is swapped in for DuckDB. Any other change rebuilds
+    the database with ingest().
+    """
+    path = path or default_path(backend)
+    if not os.path.exists(path):
+        return ingest(path, backend)
+    version = _version_token()
+    building = f'{path}.{os.getpid()}.tmp' if backend == 'duckdb' else path
+    if building != path:
+        shutil.copyfile(path, building)
+    conn = connect(building, backend, read_only=False)
+    try:
+        # Another process updating the same file waits here, then finds nothing left to load
+        conn.execute("BEGIN TRANSACTION" if backend == 'duckdb' else "BEGIN IMMEDIATE")
+        try:
+            current = _load_changes(conn, backend)
+            if current:
+                conn.execute("UPDATE meta SET version = ?", [version])
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT" if current else "ROLLBACK")
+    finally:
+        conn.close()
+    if not current:
+        if building != path:
+            os.remove(building)
+        return ingest(path, backend)
+    if building != path:
+        os.replace(building, path)
+    return version
+
+
+def stored_version(path=None, backend=BACKEND):
+    """Return the data version a database file was built from, or None."""
+    path = path or default_path(backend)
+    if not os.path.exists(path):
+        return None
+    conn = connect(path, backend)
+    try:
+        return conn.execute("SELECT version FROM meta").fetchone()[0]
+    except Exception:
+        return None
+    finally:
+        conn.close()
+
+
+def get_pool():
+    """Return the connection pool, first bringing the database up to date if the data files changed.
+
+    Requests served an earlier published version than the files (while the
+    refresh scheduler precomputes the new one) keep the current pool, so
+    the update runs on the scheduler's thread rather than theirs.
+    """
+    global _pool, _version
+    version = _version_token()
+    if version != _version and (_pool is None or version == _files_token()):
+        with _lock:
+            if version != _version and (_pool is None or version == _files_token()):
+                path = default_path()
+                if stored_version(path) != version:
+                    update(path)
+                if _pool is not None:
+                    _pool.retire()
+                _pool = ConnectionPool(path)
+                _version = version
+    return _pool
+
+
+def group(table, keys, measures, start=None, end=None, store=None):
+    """Sum measures of a table by key columns for a date range and store, ordered by the keys.
+
+    Returns the same frame as grouping the table's pandas cube.
+    """
+    unknown = [c for c in keys if c not in SCHEMAS[table]] + [m for m in measures if m not in AGGREGATES]
+    if unknown:
+        raise ValueError(f"Cannot group {table} by {keys} for {measures}")
+    conditions, params = [], []
+    if start is not None:
+        conditions.append('date >= ?')
+        params.append(pd.Timestamp(start).strftime('%Y-%m-%d'))
+    if end is not None:
+        conditions.append('date <= ?')
+        params.append(pd.Timestamp(end).strftime('%Y-%m-%d'))
+    if store is not None:
+        conditions.append('store_id = ?')
+        params.append(store)
+    key_list = ', '.join(keys)
+    sql = (f"SELECT {key_list}, {', '.join(f'{AGGREGATES[m]} AS {m}' for m in measures)} FROM {table}"
+           f"{' WHERE ' + ' AND '.join(conditions) if conditions else ''}"
+           f" GROUP BY {key_list} ORDER BY {key_list}")
+    with metrics.stage('load'):
+        while True:
+            try:
+                with get_pool().connection() as conn:
+                    rows = conn.execute(sql, params).fetchall()
+                break
+            except PoolClosed:
+                # The data changed between getting the pool and borrowing from it
+                continue
+    metrics.add_rows('load', len(rows))
+    result = pd.DataFrame(rows, columns=keys + list(measures))
+    result = result.astype({m: MEASURE_DTYPES[m] for m in measures})
+    if 'date' in keys and data_store.STORAGE_FORMAT != 'csv':
+        # Columnar tables hold real dates, so the pandas path groups by timestamps
+        result['date'] = pd.to_datetime(result['date'])
+    return result
+
+
+def clear():
+    """Retire the pool; the next query checks the database against the data files again."""
+    global _pool, _version
+    with _lock:
+        if _pool is not None:
+            _pool.retire()
+        _pool = None
+        _version = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest the dashboard data into an embedded SQL database.")
+    parser.add_argument('--backend', choices=BACKENDS, default=BACKEND if ENABLED else 'sqlite')
+    parser.add_argument('--db', help="Database file (default: DASHBOARD_DB or data/dashboard.<backend>)")
+    args = parser.parse_args()
+    path = args.db or default_path(args.backend)
+    ingest(path, args.backend)
+    print(f"Wrote {path}")
+
+
+if __name__ == '__main__':
+    main()
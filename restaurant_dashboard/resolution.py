@@ -0,0 +1,89 @@
+"""Resolution-aware time series for the long date charts.
+
+Daily series are bucketed into weeks or months when the selected range would
+otherwise plot more than DASHBOARD_MAX_POINTS points, and line traces that
+are still too long are thinned with Largest-Triangle-Three-Buckets, which
+keeps the visual peaks and troughs. DASHBOARD_RESOLUTION forces day, week or
+month buckets; DASHBOARD_MAX_POINTS=0 plots every day.
+"""
+import os
+
+import numpy as np
+import pandas as pd
+
+RESOLUTION = os.environ.get('DASHBOARD_RESOLUTION', 'auto')
+
+# Most points plotted per trace
+MAX_POINTS = int(os.environ.get('DASHBOARD_MAX_POINTS', 400))
+
+# Bucket -> (approximate days per bucket, pandas period, axis title)
+BUCKETS = {
+    'day': (1, 'D', 'Date'),
+    'week': (7, 'W', 'Week'),
+    'month': (30.44, 'M', 'Month'),
+}
+
+
+def choose_bucket(start, end, *series):
+    """Pick the finest bucket that keeps the date range within MAX_POINTS.
+
+    Open ends of the range fall back to the first and last dates of the series.
+    """
+    if RESOLUTION != 'auto':
+        return RESOLUTION
+    if MAX_POINTS <= 0:
+        return 'day'
+    dates = [pd.to_datetime(df['date']) for df in series if len(df)]
+    if not dates:
+        return 'day'
+    lo = pd.Timestamp(start) if start else min(d.min() for d in dates)
+    hi = pd.Timestamp(end) if end else max(d.max() for d in dates)
+    span = (hi - lo).days + 1
+    for bucket, (days, _, _) in BUCKETS.items():
+        if span / days <= MAX_POINTS:
+            return bucket
+    return 'month'
+
+
+def axis_title(bucket):
+    """Get the x axis title for a bucket."""
+    return BUCKETS[bucket][2]
+
+
+def bucket_series(df, columns, bucket):
+    """Sum a daily series into day, week or month buckets dated by their first day."""
+    if bucket == 'day' or df.empty:
+        return df
+    period = BUCKETS[bucket][1]
+    dates = pd.to_datetime(df['date']).dt.to_period(period).dt.start_time.rename('date')
+    return df.groupby(dates)[columns].sum().reset_index()
+
+
+def lttb_indices(x, y, threshold):
+    """Return the indices of the points kept by Largest-Triangle-Three-Buckets."""
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    # threshold - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    indices = np.empty(threshold, dtype=np.int64)
+    indices[0], indices[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_hi = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[hi:next_hi].mean()
+        avg_y = y[hi:next_hi].mean()
+        area = np.abs((x[a] - avg_x) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (avg_y - y[a]))
+        a = lo + int(area.argmax())
+        indices[i + 1] = a
+    return indices
+
+
+def downsample(df, column, x='date'):
+    """Thin a line series to at most MAX_POINTS points with LTTB."""
+    if MAX_POINTS <= 0 or len(df) <= MAX_POINTS:
+        return df
+    xs = pd.to_datetime(df[x]).to_numpy().astype(np.int64).astype(np.float64)
+    ys = df[column].to_numpy(dtype=np.float64)
+    return df.iloc[lttb_indices(xs, ys, MAX_POINTS)]
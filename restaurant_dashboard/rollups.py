@@ -0,0 +1,371 @@
+import functools
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+import cache_backends
+import data_store
+import metrics
+import partitions
+import query_backend
+from utils import slice_dates, load_menu_data
+
+SALES_KEYS = ['date', 'dish_id', 'hour']
+SALES_MEASURES = ['quantity', 'total_price', 'lines']
+
+# Sales and expenses files without a store_id column belong to a single store
+STORE_COLUMN = 'store_id'
+DEFAULT_STORE = 1
+
+# Columns read to build the sales and expense cubes, and the dtypes their numbers are parsed as
+SALES_COLUMNS = SALES_KEYS + ['quantity', 'total_price', STORE_COLUMN]
+EXPENSE_COLUMNS = ['date', 'category', 'amount', STORE_COLUMN]
+DTYPES = {'dish_id': 'int32', 'hour': 'int32', 'quantity': 'int64', 'total_price': 'float64',
+          'amount': 'float64', STORE_COLUMN: 'int32'}
+
+# Processes aggregating stores in parallel once start_pool() has run; 0 or 1 aggregates in this process
+STORE_WORKERS = int(os.environ.get('DASHBOARD_STORE_WORKERS', os.cpu_count() or 1))
+
+# Smaller reads are aggregated in this process, where pool overhead would dominate
+PARALLEL_MIN_ROWS = 500_000
+
+# Most (rollup, date range) results kept at once
+MAX_CACHED = 256
+
+# (rollup name, start, end, store, arguments, data version) -> result; several versions can coexist
+# while the refresh scheduler precomputes a new one
+_cache = {}
+_lock = threading.RLock()
+
+# Sales file path -> incrementally maintained per-store cubes and the position it was read up to
+_files = {}
+
+_pool = None
+
+
+def _new_state():
+    return {
+        'stat': None,
+        'offset': 0,
+        'fingerprint': None,
+        'columns': None,
+        'cubes': None,
+        'chain': None,
+        'version': None,
+    }
+
+
+def _aggregate_sales(sales_df):
+    """Reduce order lines to the (date, dish_id, hour) cube."""
+    return sales_df.groupby(SALES_KEYS).agg(
+        quantity=('quantity', 'sum'),
+        total_price=('total_price', 'sum'),
+        lines=('quantity', 'size'),
+    ).reset_index()
+
+
+def _fold(cube, new_cube):
+    """Add a partial cube into an existing one."""
+    return pd.concat([cube, new_cube]).groupby(SALES_KEYS)[SALES_MEASURES].sum().reset_index()
+
+
+def _empty_cube():
+    cube = pd.DataFrame(columns=SALES_KEYS + SALES_MEASURES)
+    return cube.astype({column: DTYPES.get(column, 'int64') for column in cube.columns if column != 'date'})
+
+
+def start_pool(workers=STORE_WORKERS):
+    """Start the process pool that aggregates large reads store by store.
+
+    Call it once, at startup. Workers are started by a fork server (or
+    spawned), never forked from the threaded server, so they cannot inherit
+    a lock held by one of its threads.
+    """
+    global _pool
+    if _pool is None and workers > 1:
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+        _pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+    return _pool
+
+
+def _aggregate_stores(sales_df):
+    """Reduce order lines to one cube per store.
+
+    Large reads spanning several stores are aggregated store by store across
+    the pool, once started.
+    """
+    if STORE_COLUMN not in sales_df:
+        return {DEFAULT_STORE: _aggregate_sales(sales_df)}
+    columns = SALES_KEYS + ['quantity', 'total_price']
+    groups = {int(store): rows[columns] for store, rows in sales_df.groupby(STORE_COLUMN)}
+    if _pool is not None and len(groups) > 1 and len(sales_df) >= PARALLEL_MIN_ROWS:
+        return dict(zip(groups, _pool.map(_aggregate_sales, groups.values())))
+    return {store: _aggregate_sales(rows) for store, rows in groups.items()}
+
+
+def _merge_stores(cubes):
+    """Merge per-store cubes into the chain-wide cube."""
+    if not cubes:
+        return _empty_cube()
+    if len(cubes) == 1:
+        return next(iter(cubes.values()))
+    return pd.concat(cubes.values()).groupby(SALES_KEYS)[SALES_MEASURES].sum().reset_index()
+
+
+def _fold_stores(cubes, new_cubes):
+    """Add per-store partial cubes into existing ones."""
+    cubes = dict(cubes)
+    for store, new_cube in new_cubes.items():
+        cubes[store] = _fold(cubes[store], new_cube) if store in cubes else new_cube
+    return cubes
+
+
+def _stream_cubes(f, start, end, columns):
+    """Aggregate the CSV lines between two offsets into per-store cubes, chunk by chunk.
+
+    Only the cube columns are parsed, and each chunk is folded in before the
+    next is read, so memory stays proportional to data_store.CHUNK_ROWS.
+    """
+    cubes = {}
+    for chunk in data_store.iter_lines(f, start, end, columns, SALES_COLUMNS.__contains__, DTYPES):
+        cubes = _fold_stores(cubes, _aggregate_stores(chunk))
+    return cubes
+
+
+def _refresh_csv(state, path, stat):
+    with open(path, 'rb') as f:
+        offset = data_store.lines_end(f, stat[1])
+        if state['cubes'] is not None and data_store.is_append(f, state['stat'][1], state['offset'],
+                                                               state['fingerprint']):
+            cubes, chain, columns = state['cubes'], state['chain'], state['columns']
+            if offset > state['offset']:
+                new_cubes = _stream_cubes(f, state['offset'], offset, columns)
+                cubes = _fold_stores(cubes, new_cubes)
+                chain = _fold(chain, _merge_stores(new_cubes))
+            else:
+                offset = state['offset']
+        else:
+            f.seek(0)
+            header = f.readline()
+            if offset >= len(header) > 0:
+                columns = header.decode().strip().split(',')
+                cubes = _stream_cubes(f, len(header), offset, columns)
+            else:
+                columns = None
+                cubes = {}
+                offset = 0
+            chain = _merge_stores(cubes)
+        fingerprint = data_store.fingerprint(f, offset)
+    state.update(stat=stat, offset=offset, fingerprint=fingerprint, columns=columns, cubes=cubes, chain=chain,
+                 version=(stat[0], offset))
+
+
+def refresh_file(path):
+    """Bring the per-store and chain cubes of one sales file up to date and return its version.
+
+    Rows appended to a CSV since the last refresh are parsed on their own and
+    folded into the cubes. A truncated or rewritten file triggers a full
+    rebuild, as does any change to a columnar file, which cannot be appended to.
+    """
+    stat = data_store.file_signature(path)
+    with _lock:
+        state = _files.setdefault(path, _new_state())
+        if stat == state['stat']:
+            return state['version']
+        if path.endswith('.csv'):
+            _refresh_csv(state, path, stat)
+        else:
+            cubes = {}
+            for chunk in data_store.iter_chunks(path, SALES_COLUMNS, DTYPES):
+                cubes = _fold_stores(cubes, _aggregate_stores(chunk))
+            state.update(stat=stat, cubes=cubes, chain=_merge_stores(cubes), version=stat)
+        return state['version']
+
+
+def refresh_sales(start=None, end=None):
+    """Bring the cubes of the sales files covering a date range up to date.
+
+    Only the partitions overlapping the range are opened. Returns the version
+    of the data the range is served from.
+    """
+    paths = partitions.sales_paths(start, end)
+    with _lock:
+        return tuple((path, refresh_file(path)) for path in paths)
+
+
+def table_version(name, start=None, end=None):
+    """Return the version of a table, or of the sales files covering a date range.
+
+    Only file signatures are read, so a version can be checked against the
+    shared cache without building the cubes.
+    """
+    if name == 'sales':
+        return tuple(data_store.version_signature(path) for path in partitions.sales_paths(start, end))
+    return data_store.data_version(name)[0]
+
+
+def _build(func, start, end, store, args, version):
+    """Fetch a rollup from the shared cache backend, or build and publish it."""
+    backend = cache_backends.get_backend()
+    shared_key = cache_backends.make_key('rollup', func.__name__, start, end, store, args, version)
+    result = backend.get(shared_key) if backend.shared else None
+    if result is None:
+        with metrics.stage('transform'):
+            result = func(start, end, store, *args)
+        if isinstance(result, pd.DataFrame):
+            metrics.add_rows('transform', len(result))
+        if backend.shared:
+            backend.set(shared_key, result)
+    return result
+
+
+def rollup(*tables):
+    """Cache a rollup builder per date range and store until one of the tables it reads changes.
+
+    Any further (hashable) arguments are part of the cache key too. Results
+    are kept in process and, with a shared cache backend, published for the
+    other workers.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(start=None, end=None, store=None, *args):
+            version = tuple(table_version(table, start, end) for table in tables)
+            key = (func.__name__, start, end, store, args, version)
+            result = _cache.get(key)
+            if result is None:
+                with _lock:
+                    result = _cache.get(key)
+                    if result is None:
+                        result = _build(func, start, end, store, args, version)
+                        _cache[key] = result
+                        while len(_cache) > MAX_CACHED:
+                            _cache.pop(next(iter(_cache)))
+            if isinstance(result, pd.DataFrame):
+                return result.copy(deep=False)
+            return result
+        return wrapper
+    return decorator
+
+
+def sales_cube(start=None, end=None, store=None):
+    """Quantity, revenue and order-line count at (date, dish_id, hour) grain.
+
+    Without a store, the chain-wide cube merged from the per-store cubes.
+    """
+    with _lock:
+        paths = [path for path, _ in refresh_sales(start, end)]
+        if store is None:
+            cubes = [_files[path]['chain'] for path in paths]
+        else:
+            cubes = [_files[path]['cubes'].get(store, _empty_cube()) for path in paths]
+    if not cubes:
+        # The range touches no partition
+        cube = _empty_cube()
+    elif len(cubes) == 1:
+        cube = cubes[0]
+    else:
+        # Partitions hold disjoint, ordered dates, so their cubes stack in date order
+        cube = pd.concat(cubes, ignore_index=True)
+    return slice_dates(cube, start, end).copy(deep=False)
+
+
+def _sales_by(keys, measures, start=None, end=None, store=None):
+    """Sum sales measures by cube keys, in SQL when the query backend is enabled."""
+    if query_backend.ENABLED:
+        return query_backend.group('sales', keys, measures, start, end, store)
+    return sales_cube(start, end, store).groupby(keys)[measures].sum().reset_index()
+
+
+@rollup('sales')
+def daily_sales(start=None, end=None, store=None):
+    """Quantity, revenue and order lines per date."""
+    return _sales_by(['date'], SALES_MEASURES, start, end, store)
+
+
+def dish_totals(cube):
+    """Sum quantity and revenue per dish with np.bincount over the dense dish ids."""
+    ids = cube['dish_id'].to_numpy(dtype=np.int64)
+    present = np.flatnonzero(np.bincount(ids)) if len(ids) else np.array([], dtype=np.int64)
+    quantity = np.bincount(ids, weights=cube['quantity'].to_numpy(dtype=np.float64))
+    revenue = np.bincount(ids, weights=cube['total_price'].to_numpy(dtype=np.float64))
+    return pd.DataFrame({
+        'dish_id': present,
+        'quantity': quantity[present].astype(np.int64),
+        'total_price': revenue[present],
+    })
+
+
+@rollup('menu')
+def menu_dimension(start=None, end=None, store=None):
+    """The menu indexed by dish_id, for joining onto per-dish aggregates."""
+    return load_menu_data().set_index('dish_id')
+
+
+@rollup('sales', 'menu')
+def dish_sales(start=None, end=None, store=None):
+    """Quantity and revenue per dish, joined with the menu.
+
+    The join runs on the per-dish totals, so it costs O(dishes) rather than
+    O(order lines).
+    """
+    if query_backend.ENABLED:
+        totals = query_backend.group('sales', ['dish_id'], ['quantity', 'total_price'], start, end, store)
+    else:
+        totals = dish_totals(sales_cube(start, end, store))
+    menu = menu_dimension()
+    totals = totals[totals['dish_id'].isin(menu.index)].reset_index(drop=True)
+    return totals.join(menu, on='dish_id')
+
+
+@rollup('sales', 'menu')
+def sales_totals(start=None, end=None, store=None):
+    """Headline totals: revenue, order lines and the best-selling dish."""
+    # The daily totals are already a query of their own with the SQL backend
+    sums = daily_sales(start, end, store) if query_backend.ENABLED else sales_cube(start, end, store)
+    dishes = dish_sales(start, end, store)
+    top_dish = dishes.loc[dishes['quantity'].idxmax()] if len(dishes) else None
+    return {
+        'total_revenue': sums['total_price'].sum(),
+        'total_orders': int(sums['lines'].sum()),
+        'top_dish_id': None if top_dish is None else top_dish['dish_id'],
+        'top_dish_name': None if top_dish is None else top_dish['dish_name'],
+    }
+
+
+@rollup('expenses')
+def expense_cube(start=None, end=None, store=None):
+    """Expense amount at (date, category) grain, sorted by date, over all history.
+
+    The expenses file is read chunk by chunk, folding each chunk's totals in.
+    """
+    totals = None
+    for expenses in data_store.iter_chunks(data_store.table_path('expenses'), EXPENSE_COLUMNS, DTYPES):
+        if store is not None and STORE_COLUMN in expenses:
+            expenses = expenses[expenses[STORE_COLUMN] == store]
+        elif store is not None and store != DEFAULT_STORE:
+            expenses = expenses.iloc[:0]
+        chunk_totals = expenses.groupby(['date', 'category'])['amount'].sum()
+        totals = chunk_totals if totals is None else totals.add(chunk_totals, fill_value=0)
+    return totals.reset_index()
+
+
+@rollup('sales')
+def store_ids(start=None, end=None, store=None):
+    """Return the ids of the stores with sales, in order."""
+    if query_backend.ENABLED:
+        return query_backend.group('sales', [STORE_COLUMN], ['lines'])[STORE_COLUMN].tolist()
+    with _lock:
+        refresh_sales()
+        return sorted({store for state in _files.values() if state['cubes'] for store in state['cubes']})
+
+
+def clear():
+    """Drop every cached rollup and the incremental sales state."""
+    with _lock:
+        _cache.clear()
+        _files.clear()
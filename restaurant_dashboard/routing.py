@@ -0,0 +1,149 @@
+import contextvars
+import functools
+import json
+import os
+import time
+
+from dash import callback, Input, Output
+import dash_bootstrap_components as dbc
+
+import cache_backends
+import data_store
+import metrics
+import utils
+
+# Run the page callbacks that opt in as background jobs (needs diskcache, multiprocess and psutil)
+BACKGROUND = os.environ.get('DASHBOARD_BACKGROUND', '0').lower() not in ('', '0', 'false')
+
+# Job cache directory, shared by every worker on the host
+BACKGROUND_DIR = os.environ.get('DASHBOARD_BACKGROUND_DIR') or utils.get_data_path('background_jobs')
+
+# Seconds a finished job's figures are reused for the same inputs and data version
+BACKGROUND_EXPIRE = int(os.environ.get('DASHBOARD_BACKGROUND_EXPIRE', 600))
+
+# Page id -> the function behind its figure callback, for tools that call it directly
+page_callbacks = {}
+
+_manager = None
+_jobs = None
+# set_progress of the background job running in this process
+_progress = contextvars.ContextVar('progress', default=None)
+
+
+def page_root_id(page_id):
+    """Get the id of a page's root component."""
+    return f'{page_id}-page'
+
+
+def progress_id(page_id):
+    """Get the id of a page's background job progress bar."""
+    return f'{page_id}-progress'
+
+
+def progress_bar(page_id):
+    """The bar a background page shows while its figures are computed; None without background jobs."""
+    if not BACKGROUND:
+        return None
+    return dbc.Progress(id=progress_id(page_id), value=0, striped=True, animated=True, color="warning",
+                        className="mb-3", style={"display": "none"})
+
+
+def report_progress(done, total):
+    """Report the progress of the background page job running on this thread, if any."""
+    set_progress = _progress.get()
+    if set_progress is not None:
+        set_progress((int(100 * done / total), f'{done}/{total}'))
+
+
+def _background_manager():
+    global _manager, _jobs
+    if _manager is None:
+        try:
+            import diskcache
+        except ImportError:
+            raise ImportError("Background callbacks need the 'diskcache' package "
+                              "(pip install \"dash[diskcache]\")") from None
+        from dash import DiskcacheManager
+
+        _jobs = diskcache.Cache(BACKGROUND_DIR)
+        # Finished results are reused until the data changes
+        _manager = DiskcacheManager(_jobs, cache_by=[lambda: repr(data_store.dataset_version())],
+                                    expire=BACKGROUND_EXPIRE)
+    return _manager
+
+
+def _acquire(key):
+    """Take a lock shared by every job process, breaking it if the job holding it was cancelled."""
+    import psutil
+
+    while not _jobs.add(key, os.getpid(), expire=BACKGROUND_EXPIRE):
+        holder = _jobs.get(key)
+        if holder is not None and not psutil.pid_exists(holder):
+            with _jobs.transact():
+                if _jobs.get(key) == holder:
+                    _jobs.delete(key)
+        else:
+            time.sleep(0.05)
+
+
+def _run_once(func):
+    """Make identical page jobs (same inputs and data version) compute their figures only once.
+
+    A job started while an identical one runs waits for it and returns its
+    result, and Dash serves the result to both requests.
+    """
+    @functools.wraps(func)
+    def job(set_progress, *args):
+        key = cache_backends.make_key('page-job', func.__module__, func.__name__,
+                                      json.dumps(args, sort_keys=True, default=str), data_store.dataset_version())
+        token = _progress.set(set_progress)
+        _acquire('lock:' + key)
+        try:
+            result = _jobs.get(key)
+            if result is None:
+                result = func(*args)
+                _jobs.set(key, result, expire=BACKGROUND_EXPIRE)
+            return result
+        finally:
+            _jobs.delete('lock:' + key)
+            _progress.reset(token)
+    return job
+
+
+def page_callback(page_id, *outputs, background=False):
+    """Register a callback that only runs while its page is mounted.
+
+    Instead of the global url, the callback is triggered by the page's root
+    component (so it fires once when the page is rendered) and by the global
+    date range and store selection. Dash skips callbacks whose inputs are not
+    in the layout, so navigating to another page or changing the filters
+    elsewhere never sends a request for this page's figures.
+
+    With background=True and DASHBOARD_BACKGROUND=1, the callback runs as a
+    background job instead of on a server thread. The page's progress_bar
+    tracks it, and leaving the page cancels it.
+    """
+    inputs = (
+        Input(page_root_id(page_id), 'id'),
+        Input('date-range', 'data'),
+        Input('store', 'data'),
+    )
+    background = background and BACKGROUND
+    if background:
+        register = callback(
+            *outputs,
+            *inputs,
+            background=True,
+            manager=_background_manager(),
+            progress=[Output(progress_id(page_id), 'value'), Output(progress_id(page_id), 'label')],
+            running=[(Output(progress_id(page_id), 'style'), {"display": "flex"}, {"display": "none"})],
+            cancel=[Input('url', 'pathname')],
+        )
+    else:
+        register = callback(*outputs, *inputs)
+
+    def decorator(func):
+        page_callbacks[page_id] = func
+        instrumented = metrics.instrument(f'callback:{page_id}', func)
+        return register(_run_once(instrumented) if background else instrumented)
+    return decorator
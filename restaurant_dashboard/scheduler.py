@@ -0,0 +1,83 @@
+"""Background refresh of the page aggregates.
+
+Every DASHBOARD_REFRESH_INTERVAL seconds the data files are checked. When
+any changed, every page's default view and the Overview KPI snapshot are
+precomputed for the new files on a pool of DASHBOARD_REFRESH_WORKERS
+threads, and only then is the new data version published to requests in
+one step. Until that swap, requests keep reading the previous, fully
+computed version, so a refresh never lands on the request path.
+
+A published version is served for at most DASHBOARD_MAX_STALENESS seconds
+after it was last confirmed current; if refreshes stop keeping up, requests
+go back to reading the files directly.
+"""
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import data_store
+import kpis
+import routing
+
+INTERVAL = float(os.environ.get('DASHBOARD_REFRESH_INTERVAL', 5))
+WORKERS = int(os.environ.get('DASHBOARD_REFRESH_WORKERS', 4))
+
+# The date-range store's data while no dates are picked
+DEFAULT_VIEW = {'start': None, 'end': None}
+
+logger = logging.getLogger(__name__)
+
+_thread = None
+_stop = threading.Event()
+
+
+def _pinned_call(signatures, task):
+    with data_store.pinned(signatures):
+        task()
+
+
+def precompute(signatures, pool):
+    """Build every page's default view and the KPI snapshot for a data version."""
+    # Called with the arguments Dash sends for the default view, so the figure cache keys match
+    tasks = [lambda page_id=page_id, func=func: func(routing.page_root_id(page_id), DEFAULT_VIEW, None)
+             for page_id, func in routing.page_callbacks.items()]
+    tasks.append(kpis.refresh)
+    for future in [pool.submit(_pinned_call, signatures, task) for task in tasks]:
+        future.result()
+
+
+def refresh(pool):
+    """Precompute and publish the current data files if they changed, else re-confirm them."""
+    signatures = data_store.current_signatures()
+    if signatures != data_store.published_signatures():
+        precompute(signatures, pool)
+    data_store.publish(signatures)
+
+
+def _run(interval):
+    with ThreadPoolExecutor(max_workers=WORKERS, thread_name_prefix='refresh') as pool:
+        while not _stop.is_set():
+            try:
+                refresh(pool)
+            except Exception:
+                # Requests keep the last published version until it goes stale
+                logger.exception("Background data refresh failed")
+            _stop.wait(interval)
+
+
+def start(interval=INTERVAL):
+    """Start the refresh thread; a non-positive interval leaves refreshing to requests."""
+    global _thread
+    if interval <= 0 or _thread is not None:
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_run, args=(interval,), name='data-refresh', daemon=True)
+    _thread.start()
+
+
+def stop():
+    """Stop the refresh thread after its current pass."""
+    global _thread
+    _stop.set()
+    _thread = None
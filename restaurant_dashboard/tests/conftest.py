@@ -0,0 +1,84 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# The dashboard's modules import each other as top-level modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cache_backends  # noqa: E402
+import data_store  # noqa: E402
+import kpis  # noqa: E402
+import query_backend  # noqa: E402
+import rollups  # noqa: E402
+import utils  # noqa: E402
+
+MENU = pd.DataFrame({
+    'dish_id': [1, 2, 3, 4],
+    'dish_name': ['Truffle Pasta', 'Classic Burger', 'Caesar Salad', 'Tiramisu'],
+    'category': ['Main', 'Main', 'Starter', 'Dessert'],
+    'price': [24.99, 16.5, 11.0, 8.5],
+})
+
+
+def make_sales(start='2024-01-01', days=60, stores=None, seed=0):
+    """Order lines for a few dishes over consecutive days, optionally across stores."""
+    rng = np.random.default_rng(seed)
+    rows = days * 40
+    dish_ids = rng.integers(1, 5, rows)
+    quantity = rng.integers(1, 4, rows)
+    sales = pd.DataFrame({
+        'date': (pd.Timestamp(start) + pd.to_timedelta(np.sort(rng.integers(0, days, rows)), unit='D'))
+        .strftime('%Y-%m-%d'),
+        'dish_id': dish_ids,
+        'quantity': quantity,
+        'total_price': quantity * MENU.set_index('dish_id')['price'].reindex(dish_ids).to_numpy(),
+        'hour': rng.integers(11, 23, rows),
+    })
+    if stores:
+        sales['store_id'] = rng.integers(1, stores + 1, rows)
+    return sales
+
+
+def make_expenses(start='2024-01-01', days=60, stores=None):
+    dates = pd.date_range(start, periods=days).strftime('%Y-%m-%d')
+    expenses = pd.DataFrame({
+        'date': np.repeat(dates, 2),
+        'category': ['Ingredients', 'Rent'] * days,
+        'amount': np.tile([120.0, 80.0], days),
+    })
+    if stores:
+        expenses['store_id'] = np.arange(len(expenses)) % stores + 1
+    return expenses
+
+
+def reset_caches():
+    data_store.clear()
+    data_store._published = None
+    rollups.clear()
+    kpis.clear()
+    query_backend.clear()
+    cache_backends._backend = None
+
+
+@pytest.fixture
+def dataset(tmp_path, monkeypatch):
+    """A small CSV dataset in a temporary data directory, with every cache reset."""
+    MENU.to_csv(tmp_path / 'menu.csv', index=False)
+    make_sales().to_csv(tmp_path / 'sales.csv', index=False)
+    make_expenses().to_csv(tmp_path / 'expenses.csv', index=False)
+    monkeypatch.setattr(utils, 'DATA_DIR', str(tmp_path))
+    reset_caches()
+    yield tmp_path
+    reset_caches()
+
+
+@pytest.fixture(scope='session')
+def pages():
+    """Import the app so every page registers its callbacks."""
+    import app  # noqa: F401
+    import routing
+
+    return routing.page_callbacks
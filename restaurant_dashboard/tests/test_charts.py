@@ -0,0 +1,39 @@
+import time
+
+import pytest
+
+import charts
+import metrics
+
+
+@pytest.fixture
+def chart_ids(pages):
+    return ['revenue-trend-graph', 'category-pie-graph', 'expense-pie-graph']
+
+
+def test_chart_aggregates_are_cached_rollups(dataset, chart_ids):
+    first = charts.chart_data(chart_ids, '2024-01-15', '2024-02-15')
+    sources = dict(charts.SOURCES)
+    for source in sources:
+        charts.SOURCES[source] = None
+    try:
+        again = charts.chart_data(chart_ids, '2024-01-15', '2024-02-15')
+    finally:
+        charts.SOURCES.update(sources)
+    for chart_id in chart_ids:
+        assert again[chart_id].equals(first[chart_id])
+
+
+def test_cube_slicing_counts_as_transform(dataset, chart_ids, monkeypatch):
+    def slow_sales(start, end, store):
+        time.sleep(0.2)
+        return sales(start, end, store)
+
+    sales = charts.SOURCES['sales']
+    monkeypatch.setitem(charts.SOURCES, 'sales', slow_sales)
+    monkeypatch.setattr(metrics, 'ENABLED', True)
+    render = metrics.instrument('test:render', charts.render)
+    render(chart_ids, '2024-01-15', '2024-02-15')
+    assert metrics._rows['test:render', 'transform'] > 0
+    assert metrics._stage_seconds['test:render', 'transform'] >= 0.2
+    assert metrics._stage_seconds['test:render', 'figure'] < 0.2
@@ -0,0 +1,50 @@
+import pandas as pd
+import pytest
+
+import ingest
+import rollups
+
+ROW = {'date': '2024-03-01', 'dish_id': 2, 'quantity': 3, 'total_price': 49.5, 'hour': 12}
+
+
+@pytest.fixture
+def writer(dataset, monkeypatch):
+    writer = ingest.BatchWriter(str(dataset / 'pos.sqlite'))
+    monkeypatch.setattr(ingest, '_writer', writer)
+    return writer
+
+
+@pytest.mark.parametrize('column, value', [
+    ('dish_id', True), ('quantity', True), ('hour', False), ('total_price', True),
+    ('dish_id', 99), ('quantity', 1.5), ('hour', 24), ('date', '01/03/2024'),
+])
+def test_invalid_values_are_rejected(dataset, column, value):
+    with pytest.raises(ingest.ValidationError) as error:
+        ingest.validate('sales', [ROW, {**ROW, column: value}])
+    assert [row for row, _ in error.value.errors] == [1]
+
+
+def test_store_id_must_fit_a_single_store_file(dataset):
+    assert ingest.validate('sales', [{**ROW, 'store_id': 1}])['store_id'].tolist() == [1]
+    with pytest.raises(ingest.ValidationError):
+        ingest.validate('sales', [{**ROW, 'store_id': 2}])
+    with pytest.raises(ingest.ValidationError):
+        ingest.validate('expenses', [{'date': '2024-03-01', 'category': 'Rent', 'amount': True}])
+
+
+def test_ingested_rows_are_exported_and_folded_in(dataset, writer):
+    before = rollups.sales_totals()
+    assert ingest.ingest('sales', [ROW, ROW], batch_id='till-1') == 2
+    writer.flush()
+    after = rollups.sales_totals()
+    assert after['total_orders'] == before['total_orders'] + 2
+    assert after['total_revenue'] == pytest.approx(before['total_revenue'] + 99.0)
+    assert pd.read_csv(dataset / 'sales.csv').iloc[-1].to_dict() == ROW
+
+
+def test_resent_batch_is_stored_once(dataset, writer):
+    lines = len(pd.read_csv(dataset / 'sales.csv'))
+    assert ingest.ingest('sales', [ROW], batch_id='till-1') == 1
+    assert ingest.ingest('sales', [ROW], batch_id='till-1') == 0
+    writer.flush()
+    assert len(pd.read_csv(dataset / 'sales.csv')) == lines + 1
@@ -0,0 +1,15 @@
+import kpis
+from conftest import make_sales
+
+
+def test_snapshot_follows_appended_sales(dataset):
+    before = kpis.snapshot()
+    make_sales(start='2024-03-01', days=2, seed=1).to_csv(dataset / 'sales.csv', mode='a', header=False, index=False)
+    after = kpis.snapshot()
+    assert after['total_orders'] > before['total_orders']
+
+
+def test_clear_drops_snapshots(dataset):
+    kpis.snapshot()
+    kpis.clear()
+    assert not kpis._snapshots and not kpis._latest
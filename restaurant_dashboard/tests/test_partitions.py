@@ -0,0 +1,28 @@
+import pandas as pd
+import pytest
+
+import partitions
+import rollups
+import routing
+
+
+@pytest.fixture
+def partitioned(dataset):
+    partitions.write_partitions('month')
+    return dataset
+
+
+def test_load_sales_range_reads_only_overlapping_partitions(partitioned):
+    df = partitions.load_sales_range('2024-02-01', '2024-02-29')
+    sales = pd.read_csv(partitioned / 'sales.csv')
+    assert len(df) == sales['date'].between('2024-02-01', '2024-02-29').sum()
+    assert partitions.sales_paths('2024-02-01', '2024-02-29') == [partitions.list_partitions()[1][1]]
+
+
+@pytest.mark.parametrize('start, end', [('2020-01-01', '2020-02-28'), ('2030-01-01', None)])
+def test_range_outside_every_partition_is_empty(partitioned, pages, start, end):
+    df = partitions.load_sales_range(start, end, columns=['date', 'quantity'])
+    assert df.empty and list(df.columns) == ['date', 'quantity']
+    assert rollups.sales_cube(start, end).empty
+    for page_id, callback in pages.items():
+        callback(routing.page_root_id(page_id), {'start': start, 'end': end}, None)
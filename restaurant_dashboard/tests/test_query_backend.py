@@ -0,0 +1,84 @@
+import importlib
+import os
+
+import pandas as pd
+import pytest
+
+import charts
+import kpis
+import query_backend
+import rollups
+from conftest import make_expenses, make_sales, reset_caches
+
+BACKENDS = ['sqlite', pytest.param('duckdb', marks=pytest.mark.skipif(
+    importlib.util.find_spec('duckdb') is None, reason="duckdb is not installed"))]
+
+VIEWS = [(None, None, None), ('2024-01-20', '2024-02-10', None), (None, '2024-02-10', 2), ('2024-02-01', None, 3)]
+
+
+@pytest.fixture
+def stores(dataset):
+    make_sales(stores=3).to_csv(dataset / 'sales.csv', index=False)
+    make_expenses(stores=3).to_csv(dataset / 'expenses.csv', index=False)
+    reset_caches()
+    return dataset
+
+
+@pytest.fixture
+def use_backend(stores, monkeypatch):
+    """Switch the query backend on; the module is reloaded because its defaults are bound at import."""
+    def use(backend):
+        monkeypatch.setenv('DASHBOARD_QUERY_BACKEND', backend)
+        monkeypatch.setenv('DASHBOARD_DB', str(stores / f'dashboard.{backend}'))
+        query_backend.clear()
+        importlib.reload(query_backend)
+        reset_caches()
+    yield use
+    query_backend.clear()
+    monkeypatch.delenv('DASHBOARD_QUERY_BACKEND')
+    importlib.reload(query_backend)
+
+
+def _results(chart_ids):
+    results = {}
+    for start, end, store in VIEWS:
+        results[start, end, store] = {
+            'daily': rollups.daily_sales(start, end, store),
+            'dishes': rollups.dish_sales(start, end, store),
+            'totals': rollups.sales_totals(start, end, store),
+            'kpis': kpis.compute(store=store),
+            'charts': charts.chart_data(chart_ids, start, end, store),
+        }
+    results['stores'] = rollups.store_ids()
+    return results
+
+
+@pytest.mark.parametrize('backend', BACKENDS)
+def test_sql_matches_pandas(use_backend, pages, backend):
+    chart_ids = list(charts.registry)
+    expected = _results(chart_ids)
+    use_backend(backend)
+    actual = _results(chart_ids)
+    assert not rollups._files, "the SQL backend should not build the pandas sales cubes"
+    assert actual['stores'] == expected['stores'] == [1, 2, 3]
+    for view in VIEWS:
+        for name in ('daily', 'dishes'):
+            pd.testing.assert_frame_equal(actual[view][name], expected[view][name])
+        assert actual[view]['totals'] == pytest.approx(expected[view]['totals'])
+        assert actual[view]['kpis'] == pytest.approx(expected[view]['kpis'])
+        for chart_id in chart_ids:
+            pd.testing.assert_frame_equal(actual[view]['charts'][chart_id], expected[view]['charts'][chart_id],
+                                          check_dtype=False)
+
+
+def test_sqlite_appends_in_place(use_backend, stores):
+    use_backend('sqlite')
+    before = rollups.sales_totals()
+    path = query_backend.default_path()
+    inode = os.stat(path).st_ino
+    added = make_sales(start='2024-03-01', days=2, stores=3, seed=1)
+    added.to_csv(stores / 'sales.csv', mode='a', header=False, index=False)
+    after = rollups.sales_totals()
+    assert os.stat(path).st_ino == inode
+    assert after['total_orders'] == before['total_orders'] + len(added)
+    assert after['total_revenue'] == pytest.approx(pd.read_csv(stores / 'sales.csv')['total_price'].sum())
@@ -0,0 +1,103 @@
+import os
+
+import pandas as pd
+import pytest
+
+import query_backend
+import rollups
+from conftest import make_sales
+
+
+def _rebuilt_cube():
+    rollups.clear()
+    return rollups.sales_cube()
+
+
+def _touch(path):
+    # Make sure the rewrite is seen even on coarse mtime clocks
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def _rewrite_first_row(path):
+    """Change the first order line's quantity in place, keeping the file's size and tail."""
+    with open(path, 'r+b') as f:
+        header = f.readline()
+        row = f.readline()
+        fields = row.split(b',')
+        fields[2] = b'9' if fields[2] != b'9' else b'8'
+        f.seek(len(header))
+        f.write(b','.join(fields))
+
+
+def test_appended_rows_are_folded_in(dataset):
+    before = rollups.sales_cube()
+    make_sales(start='2024-03-01', days=3, seed=1).to_csv(dataset / 'sales.csv', mode='a', header=False, index=False)
+    after = rollups.sales_cube()
+    assert after['lines'].sum() > before['lines'].sum()
+    pd.testing.assert_frame_equal(after, _rebuilt_cube())
+
+
+def test_same_size_rewrite_rebuilds(dataset):
+    rollups.sales_cube()
+    _rewrite_first_row(dataset / 'sales.csv')
+    _touch(dataset / 'sales.csv')
+    pd.testing.assert_frame_equal(rollups.sales_cube(), _rebuilt_cube())
+
+
+def test_rewrite_then_append_rebuilds(dataset):
+    rollups.sales_cube()
+    _rewrite_first_row(dataset / 'sales.csv')
+    make_sales(start='2024-03-01', days=1, seed=1).to_csv(dataset / 'sales.csv', mode='a', header=False, index=False)
+    pd.testing.assert_frame_equal(rollups.sales_cube(), _rebuilt_cube())
+
+
+def _stored_quantity(path):
+    conn = query_backend.connect(path, 'sqlite')
+    try:
+        return conn.execute("SELECT SUM(quantity) FROM sales").fetchone()[0]
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize('change', ['append', 'rewrite', 'rewrite-append'])
+def test_query_backend_tracks_changes(dataset, change):
+    path = str(dataset / 'dashboard.sqlite')
+    query_backend.ingest(path, 'sqlite')
+    sales = dataset / 'sales.csv'
+    if change != 'append':
+        _rewrite_first_row(sales)
+        _touch(sales)
+    if change != 'rewrite':
+        make_sales(start='2024-03-01', days=1, seed=1).to_csv(sales, mode='a', header=False, index=False)
+    query_backend.update(path, 'sqlite')
+    assert _stored_quantity(path) == pd.read_csv(sales)['quantity'].sum()
+
+
+@pytest.fixture
+def store_pool(monkeypatch):
+    monkeypatch.setattr(rollups, 'PARALLEL_MIN_ROWS', 0)
+    pool = rollups.start_pool(workers=2)
+    yield pool
+    pool.shutdown()
+    rollups._pool = None
+
+
+def test_store_pool_matches_in_process(dataset, store_pool):
+    sales = make_sales(stores=3)
+    expected = {store: rollups._aggregate_sales(rows.drop(columns='store_id'))
+                for store, rows in sales.groupby('store_id')}
+    cubes = rollups._aggregate_stores(sales)
+    assert store_pool._mp_context.get_start_method() in ('forkserver', 'spawn')
+    assert sorted(cubes) == [1, 2, 3]
+    for store, cube in cubes.items():
+        pd.testing.assert_frame_equal(cube, expected[store])
+
+
+def test_store_ids_are_cached_per_data_version(dataset):
+    assert rollups.store_ids() == [1]
+    with pytest.MonkeyPatch.context() as patch:
+        patch.setattr(rollups, 'refresh_sales', None)
+        assert rollups.store_ids() == [1]
+    make_sales(days=2, stores=2).to_csv(dataset / 'sales.csv', index=False)
+    assert rollups.store_ids() == [1, 2]
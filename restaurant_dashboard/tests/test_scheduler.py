@@ -0,0 +1,37 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import charts
+import data_store
+import routing
+import scheduler
+from conftest import make_sales
+
+
+def _fail(*args, **kwargs):
+    raise AssertionError("figures were recomputed on the request path")
+
+
+def test_requests_after_publish_hit_precomputed_figures(dataset, pages, monkeypatch):
+    args = (routing.page_root_id('sales'), scheduler.DEFAULT_VIEW, None)
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        scheduler.refresh(pool)
+        old = pages['sales'](*args)
+        make_sales(start='2024-03-01', days=5, seed=1).to_csv(dataset / 'sales.csv', mode='a', header=False,
+                                                               index=False)
+        signatures = data_store.current_signatures()
+        scheduler.precompute(signatures, pool)
+        # Requests keep reading the published version while the next one is precomputed
+        assert pages['sales'](*args) == old
+        data_store.publish(signatures)
+
+    monkeypatch.setattr(charts, 'render', _fail)
+    new = pages['sales'](*args)
+    assert new != old
+
+
+def test_precompute_uses_the_arguments_dash_sends(dataset, pages, monkeypatch):
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        scheduler.refresh(pool)
+    monkeypatch.setattr(charts, 'render', _fail)
+    for page_id, callback in pages.items():
+        callback(routing.page_root_id(page_id), {'start': None, 'end': None}, None)
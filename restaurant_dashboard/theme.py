@@ -0,0 +1,24 @@
+"""The dashboard's yellow, white and black Plotly template.
+
+Registered as the default template, so figures only carry these few style
+settings instead of the full built-in plotly template, and page code no
+longer repeats them in every update_layout call.
+"""
+import plotly.graph_objects as go
+import plotly.io as pio
+
+TEMPLATE = 'restaurant'
+
+# Grid lines blend into the white background, as with the default template
+_axis = dict(gridcolor='white', linecolor='white', zerolinecolor='white', ticks='', automargin=True)
+
+pio.templates[TEMPLATE] = go.layout.Template(layout=dict(
+    font=dict(family="Georgia, serif", color='#2a3f5f'),
+    paper_bgcolor='white',
+    plot_bgcolor='white',
+    colorway=['#FFD700', '#000000', '#808080', '#C0C0C0', '#E0E0E0'],
+    hovermode='closest',
+    xaxis=_axis,
+    yaxis=_axis,
+))
+pio.templates.default = TEMPLATE
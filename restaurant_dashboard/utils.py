@@ -1,19 +1,68 @@
 import os
+
 import pandas as pd
 
+import data_store
+import partitions
+
+# Directory holding the data files; override to point the dashboard at another dataset
+DATA_DIR = os.environ.get(
+    'DASHBOARD_DATA_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'),
+)
+
 def get_data_path(filename):
     """Get the absolute path to a data file."""
-    current_dir = os.path.dirname(os.path.abspath(__file__))
-    return os.path.join(current_dir, 'data', filename)
+    return os.path.join(DATA_DIR, filename)
+
+def load_sales_data(columns=None):
+    """Load sales data from the shared data store."""
+    return data_store.get_table('sales', columns)
+
+def load_menu_data(columns=None):
+    """Load menu data from the shared data store."""
+    return data_store.get_table('menu', columns)
+
+def load_expenses_data(columns=None):
+    """Load expenses data from the shared data store."""
+    return data_store.get_table('expenses', columns)
+
+def load_sales_range(start=None, end=None, columns=None):
+    """Load sales rows between two dates, reading only the partitions that overlap them."""
+    return partitions.load_sales_range(start, end, columns)
+
+def _date_bound(dates, value):
+    """Convert a date to the type stored in a date column."""
+    if pd.api.types.is_datetime64_any_dtype(dates):
+        return pd.Timestamp(value)
+    return pd.Timestamp(value).strftime('%Y-%m-%d')
+
+def filter_dates(df, start=None, end=None):
+    """Keep the rows whose date falls between start and end (inclusive)."""
+    if start is None and end is None:
+        return df
+    dates = df['date']
+    mask = pd.Series(True, index=df.index)
+    if start is not None:
+        mask &= dates >= _date_bound(dates, start)
+    if end is not None:
+        mask &= dates <= _date_bound(dates, end)
+    return df[mask]
 
-def load_sales_data():
-    """Load sales data from CSV."""
-    return pd.read_csv(get_data_path('sales.csv'))
+def slice_dates(df, start=None, end=None):
+    """Slice a frame sorted by date to the rows between start and end (inclusive).
 
-def load_menu_data():
-    """Load menu data from CSV."""
-    return pd.read_csv(get_data_path('menu.csv'))
+    Uses a binary search on the date column instead of a boolean mask.
+    """
+    if start is None and end is None:
+        return df
+    dates = df['date']
+    lo = dates.searchsorted(_date_bound(dates, start), 'left') if start is not None else 0
+    hi = dates.searchsorted(_date_bound(dates, end), 'right') if end is not None else len(df)
+    return df.iloc[lo:hi]
 
-def load_expenses_data():
-    """Load expenses data from CSV."""
-    return pd.read_csv(get_data_path('expenses.csv'))
+def date_bounds(date_range):
+    """Unpack the global date-range store into (start, end)."""
+    if not date_range:
+        return None, None
+    return date_range.get('start'), date_range.get('end')